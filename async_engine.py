@@ -0,0 +1,179 @@
+"""asyncio front end for the pattern engine.
+
+Runs the same job state machines as the EventScheduler (PatternRunner,
+ConstantHold) on an asyncio event loop, waiting on loop timers instead of a
+thread, so hundreds of patterns can share one loop with other I/O:
+
+    async def main():
+        backend = get_backend()
+        async with AsyncConstantHold(backend, "shift"):
+            await run_pattern(compile_tracks(patterns), backend, reps=3)
+
+Cancelling the task running a pattern releases its keys before the
+CancelledError propagates. Loop timers cannot spin, so timing matches the
+low CPU mode.
+"""
+import asyncio
+import heapq
+import time
+
+from key_engine import DeadlineScheduler, PatternRunner, TIMING_LOW_CPU
+
+
+def _wake(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class _AsyncDriver:
+    """Stands in for the EventScheduler of a job played by run_job().
+
+    The job calls cancel() and refresh() on it from any thread; both just
+    wake the coroutine on its loop.
+    """
+
+    def __init__(self, loop, timer):
+        self.loop = loop
+        self.timer = timer
+        self.stopped = False
+        self.refreshed = False
+        self._waiter = None
+
+    def cancel(self, job):
+        self.stopped = True
+        self._wake_threadsafe()
+
+    def refresh(self, job):
+        self.refreshed = True
+        self._wake_threadsafe()
+
+    def _wake_threadsafe(self):
+        waiter = self._waiter
+        if waiter is not None:
+            self.loop.call_soon_threadsafe(_wake, waiter)
+
+    async def sleep(self, seconds=None):
+        """Sleep on a loop timer until seconds pass or we are woken (None: until woken)"""
+        loop = self.loop
+        waiter = self._waiter = loop.create_future()
+        if self.stopped or self.refreshed:
+            # Requested after the caller's check but before the waiter existed
+            self._waiter = None
+            return
+        self.timer.wakeups += 1
+        handle = loop.call_later(seconds, _wake, waiter) if seconds is not None else None
+        try:
+            await waiter
+        finally:
+            self._waiter = None
+            if handle is not None:
+                handle.cancel()
+
+
+async def run_job(job, backend):
+    """Play a job (a PatternRunner, a ConstantHold...) on the running event loop.
+
+    Returns True if the job finished on its own and False if it was stopped
+    with job.stop() or job.cancel(). If the task itself is cancelled, the
+    job's keys are released and CancelledError is raised as usual.
+    """
+    # Only used for statistics; waiting happens on loop timers
+    timer = job.timer = DeadlineScheduler(TIMING_LOW_CPU)
+    driver = _AsyncDriver(asyncio.get_running_loop(), timer)
+    # A stop or cancel issued before the task got to run still counts
+    driver.stopped = job.cancel_requested_ns is not None
+    job.scheduler = driver
+    job.anchor_ns = timer.start()
+    press, release = backend.press, backend.release
+    clock = time.perf_counter_ns
+
+    heap = []  # (deadline_ns, is_press, track number, source)
+
+    def schedule(source, deadline_ns):
+        heapq.heappush(heap, (deadline_ns, source.held_key is None, source.number, source))
+
+    sources = job.start(job.anchor_ns)
+    for source in sources:
+        schedule(source, source.deadline_ns)
+    completed = not sources and not driver.stopped
+    try:
+        while not completed and not driver.stopped:
+            if driver.refreshed:
+                driver.refreshed = False
+                for source in job.refresh(clock()):
+                    schedule(source, source.deadline_ns)
+            if not heap:
+                await driver.sleep()  # Held until stopped, or until refreshed
+                continue
+
+            deadline_ns, _, _, source = heap[0]
+            now_ns = clock()
+            resynced_ns = timer.resync(source, deadline_ns, now_ns)
+            if resynced_ns is not None:
+                heapq.heappop(heap)
+                schedule(source, resynced_ns)
+                continue
+            if now_ns < deadline_ns:
+                await driver.sleep((deadline_ns - now_ns) / 1_000_000_000)
+                continue
+
+            heapq.heappop(heap)
+            timer.record_lateness(now_ns - deadline_ns)
+            next_deadline_ns = source.fire(press, release)
+            if next_deadline_ns is not None:
+                schedule(source, next_deadline_ns)
+            elif job.source_finished(source):
+                completed = True
+    finally:
+        job.done = True
+        job.completed = completed
+        if not completed:
+            held = backend.held
+            for key in job.held_keys():
+                if key not in held:
+                    continue
+                try:
+                    release(key)
+                except Exception:
+                    pass
+            job.released_ns = clock()
+        job.timing_stats = timer.stats()
+        job.close()
+        job._done_event.set()
+    return completed
+
+
+async def run_pattern(plans, backend, reps=1, seed=None):
+    """Play compiled plans (one PatternPlan, a list or a {track: plan} dict) reps times.
+
+    reps=-1 repeats until the task is cancelled. Returns True once every
+    track has finished.
+    """
+    return await run_job(PatternRunner(plans, backend, reps, TIMING_LOW_CPU, seed), backend)
+
+
+class AsyncConstantHold:
+    """Holds a key down for the body of an async with block.
+
+        async with AsyncConstantHold(backend, "shift"):
+            await run_pattern(plan, backend)
+
+    The key is released when the block exits, including through
+    cancellation.
+    """
+
+    def __init__(self, backend, key):
+        self.backend = backend
+        self.key = key
+        self.held = False
+
+    async def __aenter__(self):
+        self.backend.press(self.key)
+        self.held = True
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        if self.held:
+            self.held = False
+            self.backend.release(self.key)
+        return False
@@ -0,0 +1,573 @@
+"""Headless timing-accuracy benchmark for the pattern engine.
+
+Runs representative patterns through PatternRunner against the recording
+backend and compares every recorded press/release with where the schedule
+says it should have happened. Results are printed as JSON so they can be
+kept and compared between releases:
+
+    python benchmark.py --minutes 2 --output bench.json
+"""
+import argparse
+import heapq
+import importlib.util
+import json
+import os
+import platform
+import random
+import sys
+import time
+from itertools import islice
+from threading import Event, Thread
+
+from hotkeys import HotkeyDispatcher
+from input_backends import KEY_DOWN, KEY_UP, RecordingBackend
+from key_engine import (ConstantHold, DurationSampler, EventScheduler, PatternRunner,
+                        compile_tracks, track_seed, TIMING_HIGH_PRECISION, TIMING_MODES)
+from macro_recorder import events_to_patterns, load_capture, recorded_notes
+from pattern_io import REST_KEY
+
+REPORT_VERSION = 1
+DEFAULT_SEED = 1234
+
+# A replayed event further than this from its recorded time (after the drift
+# so far) counts as a dropped event plus an extra one
+DEFAULT_ALIGN_TOLERANCE_MS = 50.0
+
+# Longest acceptable time from stop() to the last held key being released,
+# with the CPU under load
+STOP_BUDGET_MS = 100.0
+
+
+def _short_taps():
+    # 10 ms taps on a few keys
+    return [(key, "0.01", "0.01") for key in "asdf"], 50
+
+
+def _long_holds():
+    return [("shift", "2.0", "0.5"), ("w", "1.5", "0.25")], 2
+
+
+def _thousand_steps():
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return [(letters[i % 26], "0.001-0.004", "0.0-0.002") for i in range(1000)], 1
+
+
+def _infinite():
+    return [("w", "0.05-0.15", "0.02-0.08"), ("a", "0.03", "0.01-0.05")], -1
+
+
+def _idle_hold():
+    # One 60 s hold: the runner should sleep through it, not poll
+    return [("shift", "60.0", "0.0")], 1
+
+
+def _overlapping_tracks():
+    # Shift held for 3 s on track 2 while track 1 taps W every 200 ms
+    return [("w", "0.05", "0.15")] * 15 + [("shift", "3.0", "0.0", 2),
+                                          ("e", "0.02-0.06", "0.1-0.3", 3)], 2
+
+
+def _many_tracks():
+    # Two dozen concurrent channels, all on the runner's one thread
+    letters = "abcdefghijklmnopqrstuvwx"
+    return [(letters[track], "0.01-0.05", "0.01-0.05", track + 1)
+            for track in range(24) for _ in range(20)], 1
+
+
+def _recorded_macro(seed):
+    # A few seconds of human-like typing: taps with uneven timing under a held
+    # Shift, a long Space hold that auto-repeats, and a bounced key
+    rng = random.Random(seed)
+    events = []
+
+    def press(key, start, hold):
+        events.append((round(start * 1e9), KEY_DOWN, key))
+        events.append((round((start + hold) * 1e9), KEY_UP, key))
+
+    moment = 0.0
+    press("shift", 0.35, 2.4)
+    for i in range(40):
+        hold = rng.uniform(0.04, 0.12)
+        press("wasd"[rng.randrange(4)], moment, hold)
+        moment += hold + rng.uniform(0.03, 0.2)
+    press("space", moment, 0.8)
+    for repeat in range(1, 20):
+        events.append((round((moment + 0.25 + repeat * 0.03) * 1e9), KEY_DOWN, "space"))
+    moment += 0.9
+    press("e", moment, 0.06)
+    press("e", moment + 0.065, 0.05)
+    events.sort()
+    return events
+
+
+# name -> factory returning (patterns, repetitions)
+SCENARIOS = {
+    "short_taps": _short_taps,
+    "long_holds": _long_holds,
+    "thousand_steps": _thousand_steps,
+    "infinite": _infinite,
+    "idle_hold": _idle_hold,
+    "overlapping_tracks": _overlapping_tracks,
+    "many_tracks": _many_tracks,
+}
+
+# name -> factory returning recorded (time_ns, event_type, key) events for a seed
+CAPTURES = {
+    "recorded_macro": _recorded_macro,
+}
+
+
+def _track_schedule(number, plan, seed, repetitions):
+    # One track's events, tagged so merging orders ties like the runner's heap
+    sampler = DurationSampler(plan, track_seed(seed, number - 1))
+    keys = plan.keys
+    key_index = plan.key_index
+    steps = len(plan)
+    remaining = -1 if repetitions == -1 else steps * repetitions
+    offset_ns = 0
+    while remaining:
+        holds, waits = sampler.next_block()
+        for position in range(len(holds)):
+            key = keys[key_index[position % steps]]
+            if key == REST_KEY:
+                offset_ns += round(holds[position] * 1_000_000_000)
+            else:
+                yield offset_ns, True, number, KEY_DOWN, key
+                offset_ns += round(holds[position] * 1_000_000_000)
+                yield offset_ns, False, number, KEY_UP, key
+            offset_ns += round(waits[position] * 1_000_000_000)
+            remaining -= 1
+            if not remaining:
+                return
+
+
+def expected_schedule(plans, seed, repetitions, count=None):
+    """Yield (offset_ns, event_type, key) the way PatternRunner should emit them.
+
+    Uses DurationSamplers with the same track seeds, which produce the same
+    durations the runner played. Events of different tracks due at the same
+    instant come releases first, then in track order.
+    """
+    merged = heapq.merge(*(_track_schedule(number, plan, seed, repetitions)
+                           for number, plan in plans.items() if len(plan)))
+    for offset_ns, _, _, event_type, key in islice(merged, count):
+        yield offset_ns, event_type, key
+
+
+def percentiles(values, points=(50, 95, 99)):
+    """Nearest-rank percentiles plus max of a list of numbers"""
+    if not values:
+        values = [0]
+    ordered = sorted(values)
+    result = {}
+    for p in points:
+        rank = max(0, min(len(ordered) - 1, round(p / 100 * len(ordered)) - 1))
+        result[f"p{p}"] = ordered[rank]
+    result["max"] = ordered[-1]
+    return result
+
+
+def _ms(values):
+    return {name: round(value / 1e6, 4) for name, value in percentiles(values).items()}
+
+
+def align_events(original, replayed, tolerance_ns=round(DEFAULT_ALIGN_TOLERANCE_MS * 1e6)):
+    """Pair up two lists of (offset_ns, event_type, key) events.
+
+    Each key's downs and its ups are aligned separately, in order; an event
+    matches when its offset differs from its counterpart's by no more than
+    tolerance_ns beyond the drift of the previous match, so a slowly
+    drifting replay still lines up. Returns (pairs, dropped, extra): matched
+    (original, replayed) pairs, originals never replayed, and replayed
+    events that were not recorded.
+    """
+    streams = {}
+    for side, events in enumerate((original, replayed)):
+        for event in events:
+            streams.setdefault(event[1:], ([], []))[side].append(event)
+
+    pairs, dropped, extra = [], [], []
+    for recorded, played in streams.values():
+        i = j = 0
+        drift_ns = 0
+        while i < len(recorded) and j < len(played):
+            delta_ns = played[j][0] - recorded[i][0]
+            if abs(delta_ns - drift_ns) <= tolerance_ns:
+                pairs.append((recorded[i], played[j]))
+                drift_ns = delta_ns
+                i += 1
+                j += 1
+            elif delta_ns < drift_ns:
+                extra.append(played[j])
+                j += 1
+            else:
+                dropped.append(recorded[i])
+                i += 1
+        dropped.extend(recorded[i:])
+        extra.extend(played[j:])
+    pairs.sort()
+    dropped.sort()
+    extra.sort()
+    return pairs, dropped, extra
+
+
+def _listed(events):
+    return [{"offset_ms": round(offset_ns / 1e6, 4), "type": event_type, "key": key}
+            for offset_ns, event_type, key in events]
+
+
+def replay_capture(name, events, timing_mode=TIMING_HIGH_PRECISION, seed=DEFAULT_SEED,
+                   quantize=0.0, merge_gap=0.0, tolerance_ms=DEFAULT_ALIGN_TOLERANCE_MS):
+    """Replay recorded events through PatternRunner and report how faithful it was.
+
+    The capture is turned into patterns the way the recorder does, played once
+    against the recording backend, and every replayed press and release is
+    aligned with the recorded one. Auto-repeated key downs are not part of
+    the comparison; merging and quantizing show up as dropped events and
+    offsets.
+    """
+    notes = recorded_notes(events)
+    patterns = events_to_patterns(events, quantize, merge_gap)
+    plans = compile_tracks(patterns)
+    backend = RecordingBackend()
+    runner = PatternRunner(plans, backend, 1, timing_mode, seed)
+    runner.run()
+
+    origin_ns = notes[0][0] if notes else 0
+    original = sorted([(start_ns - origin_ns, KEY_DOWN, key) for start_ns, _, key in notes] +
+                      [(end_ns - origin_ns, KEY_UP, key) for _, end_ns, key in notes])
+    replayed = [(time_ns - runner.anchor_ns, event_type, key)
+                for time_ns, event_type, key in backend.events]
+    pairs, dropped, extra = align_events(original, replayed, round(tolerance_ms * 1e6))
+
+    per_event = []
+    offsets = []
+    step_errors = []  # Change in offset since the previous matched event
+    previous_ns = 0
+    for (expected_ns, event_type, key), (actual_ns, _, _) in pairs:
+        offset_ns = actual_ns - expected_ns
+        offsets.append(abs(offset_ns))
+        step_errors.append(abs(offset_ns - previous_ns))
+        previous_ns = offset_ns
+        per_event.append({"key": key, "type": event_type,
+                          "expected_ms": round(expected_ns / 1e6, 4),
+                          "actual_ms": round(actual_ns / 1e6, 4),
+                          "offset_ms": round(offset_ns / 1e6, 4)})
+
+    return {
+        "scenario": name,
+        "timing_mode": timing_mode,
+        "seed": runner.seed,
+        "quantize": quantize,
+        "merge_gap": merge_gap,
+        "steps": sum(len(plan) for plan in plans.values()),
+        "tracks": len(plans),
+        "events": len(original),
+        "replayed_events": len(replayed),
+        "matched_events": len(pairs),
+        "dropped_events": len(dropped),
+        "extra_events": len(extra),
+        "event_offset_ms": _ms(offsets),
+        "step_error_ms": _ms(step_errors),
+        "cumulative_drift_ms": per_event[-1]["offset_ms"] if per_event else 0.0,
+        "deadlines": runner.timing_stats,
+        "dropped": _listed(dropped),
+        "extra": _listed(extra),
+        "per_event": per_event,
+    }
+
+
+def hotkey_latency(presses=200, hotkey="ctrl+f6"):
+    """Toggle a constant hold with a hotkey the way the GUI does and time it.
+
+    Key events are injected into the recording backend, so the hook runs on
+    this thread: hook_ms is the whole key down dispatch including the
+    dispatcher's callback, and press_to_start_ms runs from the hook seeing
+    the press to the scheduler starting the hold.
+    """
+    backend = RecordingBackend()
+    scheduler = EventScheduler(backend, "bench-hotkeys").start()
+    latencies = []
+    handled = []
+    job = None
+
+    def on_start(started):
+        latencies.append(dispatcher.record_start(started.requested_ns, started.anchor_ns))
+
+    def toggle(command, pressed_ns):
+        # Runs on the dispatcher thread, standing in for the GUI thread
+        nonlocal job
+        if job is not None and not job.done:
+            job.cancel()
+            job.wait()
+            job = None
+        else:
+            job = ConstantHold("shift")
+            job.requested_ns = pressed_ns
+            job.on_start = on_start
+            scheduler.submit(job)
+        handled.append(command)
+
+    dispatcher = HotkeyDispatcher(toggle, "bench-hotkey-dispatch").start()
+    *modifiers, trigger = hotkey.split("+")
+    backend.add_hotkey(hotkey, dispatcher.callback("constant"))
+
+    hook_ns = []
+    for _ in range(presses):
+        for key in modifiers:
+            backend.inject(key)
+        begin = time.perf_counter_ns()
+        backend.inject(trigger)
+        hook_ns.append(time.perf_counter_ns() - begin)
+        backend.inject(trigger, KEY_UP)
+        for key in modifiers:
+            backend.inject(key, KEY_UP)
+        time.sleep(0.002)
+
+    deadline = time.perf_counter() + 5
+    while len(handled) < presses and time.perf_counter() < deadline:
+        time.sleep(0.001)
+    if job is not None:
+        job.cancel()
+        job.wait(1)
+    dispatcher.stop(1)
+    scheduler.shutdown(1)
+
+    return {
+        "scenario": "hotkey_latency",
+        "presses": presses,
+        "handled": len(handled),
+        "starts": len(latencies),
+        "hook_ms": _ms(hook_ns),
+        "press_to_start_ms": _ms(latencies),
+        "dispatcher": dispatcher.stats(),
+    }
+
+
+def _burn_cpu(stop):
+    # Pure Python work, so the load competes for the GIL as well as the CPU
+    while not stop.is_set():
+        sum(range(10_000))
+
+
+def _key_balance(events):
+    """(keys left down, releases of keys that were not down) of a run's events"""
+    down = set()
+    extra = 0
+    for _, event_type, key in events:
+        if event_type == KEY_DOWN:
+            down.add(key)
+        elif key in down:
+            down.discard(key)
+        else:
+            extra += 1
+    return down, extra
+
+
+def stop_latency(stops=50, load_threads=2, seed=DEFAULT_SEED):
+    """Stop a busy pattern at random moments while other threads load the CPU.
+
+    stop_call_ms is how long stop() blocks the caller, stop_to_release_ms
+    runs from the call to the scheduler having released every held key.
+    A run ending with a key still down counts as stuck; a release of a key
+    that was not down counts as extra.
+    """
+    patterns, _ = _many_tracks()
+    plans = compile_tracks(patterns)
+    backend = RecordingBackend()
+    scheduler = EventScheduler(backend, "bench-stop").start()
+    rng = random.Random(seed)
+    load_stop = Event()
+    load = [Thread(target=_burn_cpu, args=(load_stop,), name=f"bench-load-{i}", daemon=True)
+            for i in range(load_threads)]
+    for thread in load:
+        thread.start()
+
+    call_ns = []
+    latencies = []
+    held = []
+    stuck = 0
+    extra = 0
+    timeouts = 0
+    try:
+        for i in range(stops):
+            first = len(backend.events)
+            runner = scheduler.submit(PatternRunner(plans, backend, -1, TIMING_HIGH_PRECISION,
+                                                    seed + i))
+            time.sleep(rng.uniform(0.01, 0.1))
+            begin = time.perf_counter_ns()
+            runner.stop()
+            call_ns.append(time.perf_counter_ns() - begin)
+            if not runner.wait(5):
+                timeouts += 1
+                continue
+            latencies.append(runner.stop_latency_ns)
+            held.append(len(runner.held_keys()))  # What the stop released
+            down, extra_releases = _key_balance(backend.events[first:])
+            stuck += len(down)
+            extra += extra_releases
+    finally:
+        load_stop.set()
+        for thread in load:
+            thread.join()
+        scheduler.shutdown(1)
+
+    return {
+        "scenario": "stop_latency",
+        "stops": stops,
+        "tracks": len(plans),
+        "load_threads": load_threads,
+        "stop_call_ms": _ms(call_ns),
+        "stop_to_release_ms": _ms(latencies),
+        "keys_released_per_stop": round(sum(held) / len(held), 2) if held else 0.0,
+        "stuck_keys": stuck,
+        "timeouts": timeouts,
+        "extra_releases": extra,
+        "within_budget": (not stuck and not extra and not timeouts
+                          and max(latencies, default=0) < STOP_BUDGET_MS * 1e6),
+    }
+
+
+# name -> function returning a report dict; they do not depend on the timing mode
+PROBES = {
+    "hotkey_latency": hotkey_latency,
+    "stop_latency": stop_latency,
+}
+
+
+def run_scenario(name, timing_mode=TIMING_HIGH_PRECISION, seed=DEFAULT_SEED, duration=60.0):
+    """Run one scenario and return its report dict.
+
+    duration only applies to scenarios with infinite repetitions.
+    """
+    if name in PROBES:
+        return PROBES[name]()
+    if name in CAPTURES:
+        return replay_capture(name, CAPTURES[name](seed), timing_mode, seed)
+    patterns, repetitions = SCENARIOS[name]()
+    plans = compile_tracks(patterns)
+    backend = RecordingBackend()
+    runner = PatternRunner(plans, backend, repetitions, timing_mode, seed)
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    if repetitions == -1:
+        worker = Thread(target=runner.run, name=f"bench-{name}")
+        worker.start()
+        time.sleep(duration)
+        stop_ns = time.perf_counter_ns()
+        runner.stop()
+        worker.join()
+        # Releases sent by stop() are not part of the schedule
+        events = [event for event in backend.events if event[0] < stop_ns]
+    else:
+        runner.run()
+        events = list(backend.events)
+    cpu_seconds = time.process_time() - cpu_start
+    wall_seconds = time.perf_counter() - wall_start
+
+    expected = list(expected_schedule(plans, runner.seed, repetitions,
+                                      len(events) if repetitions == -1 else None))
+
+    anchor = runner.anchor_ns
+    errors = []       # Signed offset of each event from its deadline
+    hold_errors = []  # |actual - expected| hold time per key press
+    mismatched = 0
+    presses = {}      # key -> (actual, expected) offset of its last press
+    for (actual_ns, event_type, key), (expected_ns, expected_type, expected_key) in zip(events, expected):
+        if event_type != expected_type or key != expected_key:
+            mismatched += 1
+            continue
+        offset_ns = actual_ns - anchor
+        errors.append(offset_ns - expected_ns)
+        if event_type == KEY_DOWN:
+            presses[key] = offset_ns, expected_ns
+        elif key in presses:
+            press_actual, press_expected = presses.pop(key)
+            hold_errors.append(abs((offset_ns - press_actual) - (expected_ns - press_expected)))
+
+    return {
+        "scenario": name,
+        "timing_mode": timing_mode,
+        "seed": runner.seed,
+        "steps": sum(len(plan) for plan in plans.values()),
+        "tracks": len(plans),
+        "repetitions": repetitions,
+        "completed_repetitions": runner.completed_reps,
+        "events": len(events),
+        "missing_events": max(0, len(expected) - len(events)),
+        "mismatched_events": mismatched,
+        "event_error_ms": _ms([abs(error) for error in errors]),
+        "hold_error_ms": _ms(hold_errors),
+        "cumulative_drift_ms": round(errors[-1] / 1e6, 4) if errors else 0.0,
+        "wall_seconds": round(wall_seconds, 3),
+        "cpu_seconds_per_second": round(cpu_seconds / wall_seconds, 4) if wall_seconds else 0.0,
+        "wakeups_per_second": round(runner.timing_stats["wakeups"] / wall_seconds, 2) if wall_seconds else 0.0,
+        "deadlines": runner.timing_stats,
+    }
+
+
+def run_benchmarks(scenarios=None, timing_modes=TIMING_MODES, seed=DEFAULT_SEED, minutes=1.0,
+                   captures=(), quantize=0.0, merge_gap=0.0):
+    """Run the selected scenarios in every timing mode and build the full report.
+
+    captures are files written by save_capture(); each is replayed with the
+    given quantize and merge_gap and reported like a scenario.
+    """
+    if scenarios is None and not captures:
+        scenarios = list(SCENARIOS) + list(CAPTURES) + list(PROBES)
+    results = []
+    for index, timing_mode in enumerate(timing_modes):
+        for name in scenarios or ():
+            if name in PROBES and index:
+                continue  # Probes measure the same thing in every timing mode
+            print(f"Running {name} ({timing_mode})...", file=sys.stderr)
+            results.append(run_scenario(name, timing_mode, seed, minutes * 60))
+        for path in captures:
+            print(f"Replaying {path} ({timing_mode})...", file=sys.stderr)
+            results.append(replay_capture(os.path.basename(path), load_capture(path), timing_mode,
+                                          seed, quantize, merge_gap))
+    return {
+        "benchmark": "pattern_timing",
+        "version": REPORT_VERSION,
+        "python": platform.python_version(),
+        "platform": sys.platform,
+        "numpy": importlib.util.find_spec("numpy") is not None,
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure pattern timing accuracy headlessly")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS) + sorted(CAPTURES) + sorted(PROBES),
+                        help="Scenario to run (repeatable, default: all)")
+    parser.add_argument("--capture", action="append", default=[],
+                        help="Replay a capture written by 'record --capture' and report its "
+                             "fidelity (repeatable)")
+    parser.add_argument("--quantize", type=float, default=0.0,
+                        help="Quantize grid in seconds used when replaying captures")
+    parser.add_argument("--merge-gap", type=float, default=0.0,
+                        help="Merge gap in seconds used when replaying captures")
+    parser.add_argument("--timing", choices=TIMING_MODES + ("both",), default="both",
+                        help="Timing mode to measure (default: both)")
+    parser.add_argument("--minutes", type=float, default=1.0,
+                        help="How long to run the infinite-repetition scenario")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED,
+                        help="Seed for random durations")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    timing_modes = TIMING_MODES if args.timing == "both" else (args.timing,)
+    report = run_benchmarks(args.scenario, timing_modes, args.seed, args.minutes,
+                            args.capture, args.quantize, args.merge_gap)
+    text = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,264 @@
+"""Running global hotkeys without blocking the input hook.
+
+Hotkey callbacks run on the input backend's hook thread; with the
+`keyboard` package that thread sits inside the operating system's keyboard
+hook, so every moment spent there delays every key press system-wide.
+HotkeyDispatcher's callbacks only take a timestamp and put a command on a
+queue. A dispatcher thread hands the commands to a handler, which in the GUI
+emits a queued Qt signal so widgets are only touched on the GUI thread.
+
+HotkeyRegistry registers and removes hotkeys one by one as the bindings
+change, instead of unhooking everything and starting over. HotkeyTable
+collects the bindings, including the ones stored in saved configurations,
+and finds clashing hotkeys before any of them is registered.
+"""
+import time
+from itertools import combinations
+from queue import SimpleQueue
+from threading import Thread
+
+from input_backends import hotkey_keys
+from save_store import CONSTANT, PATTERN
+
+# Hook callbacks should stay well under this
+HOOK_BUDGET_NS = 1_000_000
+
+MODIFIERS = ("ctrl", "shift", "alt", "windows")
+
+
+def _key_order(key):
+    return (MODIFIERS.index(key), key) if key in MODIFIERS else (len(MODIFIERS), key)
+
+
+def normalize_hotkey(hotkey):
+    """One spelling per key combination: modifiers first, then the other keys sorted"""
+    return '+'.join(sorted(hotkey_keys(hotkey), key=_key_order))
+
+
+class HotkeyDispatcher:
+    """Queues hotkey commands from the hook thread and runs them on its own thread.
+
+    handler(command, pressed_ns) is called on the dispatcher thread for every
+    triggered hotkey; pressed_ns is the perf_counter_ns at which the hook saw
+    the press. Time spent in hook callbacks and press-to-start latencies
+    reported with record_start() are kept for stats().
+    """
+
+    def __init__(self, handler, name="HotkeyDispatcher"):
+        self.handler = handler
+        self.name = name
+        self._queue = SimpleQueue()
+        self._clock = time.perf_counter_ns
+        self._thread = None
+        self.callbacks = 0
+        self.callback_total_ns = 0
+        self.callback_max_ns = 0
+        self.starts = 0
+        self.last_start_ns = None
+        self.start_total_ns = 0
+        self.start_max_ns = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def callback(self, command):
+        """Function to register as a hotkey callback for command"""
+        clock = self._clock
+        put = self._queue.put
+
+        def on_hotkey():
+            pressed_ns = clock()
+            put((command, pressed_ns))
+            spent_ns = clock() - pressed_ns
+            self.callbacks += 1
+            self.callback_total_ns += spent_ns
+            if spent_ns > self.callback_max_ns:
+                self.callback_max_ns = spent_ns
+        return on_hotkey
+
+    def _run(self):
+        get = self._queue.get
+        while True:
+            item = get()
+            if item is None:
+                return
+            try:
+                self.handler(*item)
+            except Exception as e:
+                print(f"Error in hotkey callback: {e}")
+
+    def record_start(self, pressed_ns, started_ns):
+        """Note that the job started by a hotkey pressed at pressed_ns began at started_ns"""
+        latency_ns = started_ns - pressed_ns
+        self.starts += 1
+        self.last_start_ns = latency_ns
+        self.start_total_ns += latency_ns
+        if latency_ns > self.start_max_ns:
+            self.start_max_ns = latency_ns
+        return latency_ns
+
+    def stats(self):
+        return {
+            "hook_callbacks": self.callbacks,
+            "mean_hook_callback_us": (self.callback_total_ns / self.callbacks / 1e3) if self.callbacks else 0.0,
+            "max_hook_callback_us": self.callback_max_ns / 1e3,
+            "within_hook_budget": self.callback_max_ns <= HOOK_BUDGET_NS,
+            "starts": self.starts,
+            "last_press_to_start_ms": (self.last_start_ns / 1e6) if self.last_start_ns is not None else None,
+            "mean_press_to_start_ms": (self.start_total_ns / self.starts / 1e6) if self.starts else 0.0,
+            "max_press_to_start_ms": self.start_max_ns / 1e6,
+        }
+
+
+class HotkeyRegistry:
+    """Keeps a backend's registered hotkeys in line with the wanted bindings.
+
+    set_bindings() compares the wanted {hotkey: command} bindings with the
+    registered ones and only adds or removes what changed, so unchanged
+    hotkeys stay live throughout and the input hook is never torn down.
+    callback_for(command) gives the function to register for a command,
+    such as HotkeyDispatcher.callback.
+    """
+
+    def __init__(self, backend, callback_for, **options):
+        self.backend = backend
+        self.callback_for = callback_for
+        self.options = options  # Passed on to backend.add_hotkey()
+        self._active = {}  # hotkey -> (command, handle)
+
+    @property
+    def bindings(self):
+        return {hotkey: command for hotkey, (command, _) in self._active.items()}
+
+    def set_bindings(self, bindings):
+        """Register exactly these {hotkey: command} bindings.
+
+        Returns {hotkey: error} for the bindings the backend refused; the
+        others are applied regardless.
+        """
+        for hotkey, (command, _) in list(self._active.items()):
+            if bindings.get(hotkey) != command:
+                self.unbind(hotkey)
+        failed = {}
+        for hotkey, command in bindings.items():
+            if hotkey not in self._active:
+                try:
+                    self.bind(hotkey, command)
+                except Exception as e:
+                    failed[hotkey] = e
+        return failed
+
+    def bind(self, hotkey, command):
+        """Register one hotkey, replacing its previous command"""
+        if hotkey in self._active:
+            self.unbind(hotkey)
+        handle = self.backend.add_hotkey(hotkey, self.callback_for(command), **self.options)
+        self._active[hotkey] = (command, handle)
+
+    def unbind(self, hotkey):
+        command_handle = self._active.pop(hotkey, None)
+        if command_handle is not None:
+            try:
+                self.backend.remove_hotkey(command_handle[1])
+            except (KeyError, ValueError) as e:
+                print(f"Error removing hotkey {hotkey}: {e}")
+
+    def clear(self):
+        for hotkey in list(self._active):
+            self.unbind(hotkey)
+
+
+class HotkeyBinding:
+    """A hotkey and the command it triggers"""
+    __slots__ = ('hotkey', 'keys', 'command', 'label')
+
+    def __init__(self, hotkey, keys, command, label):
+        self.hotkey = hotkey    # Normalized spelling
+        self.keys = keys        # frozenset of key names
+        self.command = command
+        self.label = label      # What the user knows the binding as
+
+    def __repr__(self):
+        return f"HotkeyBinding({self.hotkey!r}, {self.command!r})"
+
+
+class HotkeyTable:
+    """Hotkey bindings indexed by their normalized key set.
+
+    The first binding added for a key combination wins; later ones are kept
+    in conflicts as (kept, rejected) pairs instead of silently replacing it.
+    The backends match key events against the same normalized key sets.
+    """
+
+    def __init__(self):
+        self._by_keys = {}
+        self.conflicts = []
+        self.invalid = []  # (label, hotkey, error) of unusable hotkeys
+
+    def __len__(self):
+        return len(self._by_keys)
+
+    def __iter__(self):
+        return iter(self._by_keys.values())
+
+    def add(self, hotkey, command, label=None):
+        """Bind hotkey to command. Returns the binding, or None if it clashes or is invalid."""
+        label = label or str(command)
+        try:
+            normalized = normalize_hotkey(hotkey)
+        except (ValueError, AttributeError) as e:
+            self.invalid.append((label, hotkey, str(e)))
+            return None
+        keys = frozenset(normalized.split('+'))
+        binding = HotkeyBinding(normalized, keys, command, label)
+        existing = self._by_keys.get(keys)
+        if existing is not None:
+            self.conflicts.append((existing, binding))
+            return None
+        self._by_keys[keys] = binding
+        return binding
+
+    def add_saves(self, store):
+        """Bind the hotkey of every readable save to a (config type, name) command"""
+        for config_type in (CONSTANT, PATTERN):
+            entries = sorted(store.entries(config_type), key=lambda entry: entry.name.lower())
+            for entry in entries:
+                if entry.hotkey and not entry.error:
+                    self.add(entry.hotkey, (config_type, entry.name),
+                             f"{config_type} '{entry.name}'")
+
+    def find(self, hotkey):
+        """Binding using the same key combination as hotkey, or None"""
+        try:
+            return self._by_keys.get(hotkey_keys(hotkey))
+        except (ValueError, AttributeError):
+            return None
+
+    def prefix_collisions(self):
+        """(shorter, longer) pairs where one hotkey's keys are part of another's.
+
+        Pressing the longer one passes through the shorter one, which then
+        fires first. Hotkeys have a handful of keys, so checking every
+        subset of each is cheap.
+        """
+        collisions = []
+        for binding in self._by_keys.values():
+            for size in range(1, len(binding.keys)):
+                for subset in combinations(binding.keys, size):
+                    shorter = self._by_keys.get(frozenset(subset))
+                    if shorter is not None:
+                        collisions.append((shorter, binding))
+        return collisions
+
+    def bindings(self):
+        """{hotkey: command} for HotkeyRegistry.set_bindings()"""
+        return {binding.hotkey: binding.command for binding in self._by_keys.values()}
@@ -0,0 +1,441 @@
+"""Input backends used to send and observe key events.
+
+The engine and the GUI only talk to an InputBackend, so the real `keyboard`
+module can be swapped for uinput on Linux or for a recording fake when
+measuring timing accuracy without a desktop session.
+
+Every backend keeps the set of keys it has pressed and not yet released, so
+whatever happens to the engine, release_all() lets go of exactly those keys.
+install_release_handlers() calls it when the process exits or is terminated.
+"""
+import atexit
+import os
+import select
+import signal
+import time
+from threading import Lock, Thread, current_thread, main_thread
+
+KEY_DOWN = "down"
+KEY_UP = "up"
+
+
+class KeyEvent:
+    """Minimal key event, shaped like keyboard.KeyboardEvent"""
+    __slots__ = ("name", "event_type", "time", "time_ns")
+
+    def __init__(self, name, event_type, time_ns=None):
+        self.name = name
+        self.event_type = event_type
+        self.time_ns = time.perf_counter_ns() if time_ns is None else time_ns
+        self.time = self.time_ns / 1e9
+
+    def __repr__(self):
+        return f"KeyEvent({self.name!r}, {self.event_type!r}, {self.time_ns})"
+
+
+def split_hotkey(hotkey):
+    """Turn 'ctrl+shift+a' into frozenset({'ctrl', 'shift', 'a'})"""
+    parts = [part.strip().lower() for part in hotkey.split('+')]
+    if not all(parts):
+        raise ValueError(f"Invalid hotkey: {hotkey!r}")
+    return frozenset(parts)
+
+
+# Other spellings of key names, mapped to the ones the keyboard package reports
+_KEY_ALIASES = {
+    "control": "ctrl", "left ctrl": "ctrl", "right ctrl": "ctrl",
+    "left shift": "shift", "right shift": "shift",
+    "option": "alt", "left alt": "alt",
+    "win": "windows", "cmd": "windows", "command": "windows", "super": "windows",
+    "left windows": "windows", "right windows": "windows",
+    "return": "enter", "escape": "esc", "del": "delete",
+}
+
+
+def hotkey_keys(hotkey):
+    """Normalized key set of a hotkey: 'Control+Shift+A' -> {'ctrl', 'shift', 'a'}"""
+    return frozenset(_KEY_ALIASES.get(key, key) for key in split_hotkey(hotkey))
+
+
+class InputBackend:
+    """Interface for sending key presses and listening for key events.
+
+    Subclasses press and release keys through press() and release(), which
+    keep held up to date: the keys this process has pressed and not released.
+    """
+    name = "base"
+
+    def __init__(self):
+        self.held = set()
+
+    def press(self, key):
+        raise NotImplementedError
+
+    def release(self, key):
+        raise NotImplementedError
+
+    def release_all(self):
+        """Release every key this backend holds down. Returns the released keys."""
+        # list() copies the set in one step, so presses from other threads are safe
+        keys = list(self.held)
+        for key in keys:
+            try:
+                self.release(key)
+            except Exception as e:
+                print(f"Error releasing {key}: {e}")
+        return keys
+
+    def hook(self, callback):
+        """Call callback(event) for every key event. Returns a handle for unhook()."""
+        raise NotImplementedError
+
+    def on_press(self, callback):
+        """Like hook(), but only for key down events"""
+        return self.hook(lambda event: callback(event) if event.event_type == KEY_DOWN else None)
+
+    def unhook(self, handle):
+        raise NotImplementedError
+
+    def unhook_all(self):
+        raise NotImplementedError
+
+    def add_hotkey(self, hotkey, callback, **options):
+        """Call callback() when hotkey is pressed. Returns a handle for remove_hotkey()."""
+        raise NotImplementedError
+
+    def remove_hotkey(self, handle):
+        raise NotImplementedError
+
+    def get_hotkey_name(self):
+        """Name of the key combination currently held down"""
+        raise NotImplementedError
+
+
+class KeyboardBackend(InputBackend):
+    """Backend built on the `keyboard` package (Windows and Linux as root)"""
+    name = "keyboard"
+
+    def __init__(self):
+        InputBackend.__init__(self)
+        import keyboard
+        self._keyboard = keyboard
+        self._press = keyboard.press
+        self._release = keyboard.release
+
+    def press(self, key):
+        # Noted first, so a key is never down without being in held
+        self.held.add(key)
+        self._press(key)
+
+    def release(self, key):
+        self._release(key)
+        self.held.discard(key)
+
+    def hook(self, callback):
+        return self._keyboard.hook(callback)
+
+    def on_press(self, callback):
+        return self._keyboard.on_press(callback)
+
+    def unhook(self, handle):
+        self._keyboard.unhook(handle)
+
+    def unhook_all(self):
+        self._keyboard.unhook_all()
+
+    def add_hotkey(self, hotkey, callback, **options):
+        return self._keyboard.add_hotkey(hotkey, callback, **options)
+
+    def remove_hotkey(self, handle):
+        self._keyboard.remove_hotkey(handle)
+
+    def get_hotkey_name(self):
+        return self._keyboard.get_hotkey_name()
+
+
+class _HotkeyMatcher:
+    """Hook and hotkey bookkeeping shared by the backends that do their own matching.
+
+    Hotkeys fire when the set of held keys equals the hotkey's key set.
+    Hotkeys are indexed by that set, so a key down event costs one dict
+    lookup however many hotkeys are registered. Key names go through
+    hotkey_keys() spellings on both sides, so 'control+a' matches a held
+    left ctrl and a.
+    """
+
+    def __init__(self):
+        self._hooks = {}
+        self._hotkeys = {}  # handle -> key set
+        self._by_keys = {}  # key set -> {handle: callback}
+        self._pressed = set()
+        self._next_handle = 0
+        self._hook_lock = Lock()
+
+    def _new_handle(self):
+        self._next_handle += 1
+        return self._next_handle
+
+    def hook(self, callback):
+        with self._hook_lock:
+            handle = self._new_handle()
+            self._hooks[handle] = callback
+        return handle
+
+    def unhook(self, handle):
+        with self._hook_lock:
+            self._hooks.pop(handle, None)
+
+    def unhook_all(self):
+        with self._hook_lock:
+            self._hooks.clear()
+            self._hotkeys.clear()
+            self._by_keys.clear()
+
+    def add_hotkey(self, hotkey, callback, **options):
+        keys = hotkey_keys(hotkey)
+        with self._hook_lock:
+            handle = self._new_handle()
+            self._hotkeys[handle] = keys
+            self._by_keys.setdefault(keys, {})[handle] = callback
+        return handle
+
+    def remove_hotkey(self, handle):
+        with self._hook_lock:
+            keys = self._hotkeys.pop(handle, None)
+            callbacks = self._by_keys.get(keys)
+            if callbacks is not None:
+                callbacks.pop(handle, None)
+                if not callbacks:
+                    del self._by_keys[keys]
+
+    def get_hotkey_name(self):
+        return '+'.join(sorted(self._pressed))
+
+    def _dispatch(self, event):
+        """Feed an observed key event to hooks and hotkeys"""
+        name = event.name.lower()
+        name = _KEY_ALIASES.get(name, name)
+        if event.event_type == KEY_DOWN:
+            self._pressed.add(name)
+        else:
+            self._pressed.discard(name)
+
+        with self._hook_lock:
+            hooks = list(self._hooks.values())
+            hotkeys = ()
+            if event.event_type == KEY_DOWN and self._by_keys:
+                matched = self._by_keys.get(frozenset(self._pressed))
+                if matched:
+                    hotkeys = list(matched.values())
+        for callback in hooks:
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"Error in key hook: {e}")
+        for callback in hotkeys:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error in hotkey callback: {e}")
+
+
+# Key names used by the keyboard package that do not map to KEY_<NAME> directly
+_EVDEV_ALIASES = {
+    "ctrl": "KEY_LEFTCTRL", "left ctrl": "KEY_LEFTCTRL", "right ctrl": "KEY_RIGHTCTRL",
+    "shift": "KEY_LEFTSHIFT", "left shift": "KEY_LEFTSHIFT", "right shift": "KEY_RIGHTSHIFT",
+    "alt": "KEY_LEFTALT", "left alt": "KEY_LEFTALT", "right alt": "KEY_RIGHTALT",
+    "alt gr": "KEY_RIGHTALT", "windows": "KEY_LEFTMETA", "left windows": "KEY_LEFTMETA",
+    "right windows": "KEY_RIGHTMETA", "esc": "KEY_ESC", "escape": "KEY_ESC",
+    "enter": "KEY_ENTER", "return": "KEY_ENTER", "page up": "KEY_PAGEUP",
+    "page down": "KEY_PAGEDOWN", "caps lock": "KEY_CAPSLOCK", "num lock": "KEY_NUMLOCK",
+    "scroll lock": "KEY_SCROLLLOCK", "print screen": "KEY_SYSRQ", "-": "KEY_MINUS",
+    "=": "KEY_EQUAL", "[": "KEY_LEFTBRACE", "]": "KEY_RIGHTBRACE", ";": "KEY_SEMICOLON",
+    "'": "KEY_APOSTROPHE", "`": "KEY_GRAVE", "\\": "KEY_BACKSLASH", ",": "KEY_COMMA",
+    ".": "KEY_DOT", "/": "KEY_SLASH",
+}
+
+# Back from evdev codes to the keyboard package's names ('KEY_LEFTCTRL' -> 'ctrl'),
+# so hotkeys and captured key names mean the same thing on every backend
+# (the first spelling listed for a code wins)
+_EVDEV_NAMES = {code_name: name for name, code_name in reversed(_EVDEV_ALIASES.items())}
+
+
+class UInputBackend(_HotkeyMatcher, InputBackend):
+    """Linux backend that writes to a virtual uinput device via python-evdev.
+
+    Works under Wayland and without X, but needs write access to /dev/uinput
+    and read access to /dev/input/event* for hooks. Hotkeys are observed,
+    not suppressed.
+    """
+    name = "uinput"
+
+    def __init__(self):
+        InputBackend.__init__(self)
+        _HotkeyMatcher.__init__(self)
+        import evdev
+        self._evdev = evdev
+        self._ecodes = evdev.ecodes
+        self._device = evdev.UInput(name="auto-key-holder")
+        self._names = {}  # key code -> key name, for events read back from devices
+        self._listener = None
+
+    def _code(self, key):
+        name = key.lower()
+        code_name = _EVDEV_ALIASES.get(name) or "KEY_" + name.upper().replace(' ', '')
+        code = self._ecodes.ecodes.get(code_name)
+        if code is None:
+            raise ValueError(f"Unknown key for uinput: {key!r}")
+        return code
+
+    def _write(self, key, value):
+        device = self._device
+        device.write(self._ecodes.EV_KEY, self._code(key), value)
+        device.syn()
+
+    def press(self, key):
+        self.held.add(key)
+        self._write(key, 1)
+
+    def release(self, key):
+        self._write(key, 0)
+        self.held.discard(key)
+
+    def hook(self, callback):
+        handle = _HotkeyMatcher.hook(self, callback)
+        self._ensure_listener()
+        return handle
+
+    def add_hotkey(self, hotkey, callback, **options):
+        handle = _HotkeyMatcher.add_hotkey(self, hotkey, callback)
+        self._ensure_listener()
+        return handle
+
+    def _ensure_listener(self):
+        if self._listener is None:
+            self._listener = Thread(target=self._listen, name="UInputListener", daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        evdev = self._evdev
+        ecodes = self._ecodes
+        devices = []
+        for path in evdev.list_devices():
+            try:
+                device = evdev.InputDevice(path)
+            except OSError:
+                continue
+            # Only real keyboards, and never our own virtual device
+            if ecodes.EV_KEY in device.capabilities() and device.name != "auto-key-holder":
+                devices.append(device)
+        if not devices:
+            print("uinput backend: no readable keyboard devices found")
+            return
+
+        by_fd = {device.fd: device for device in devices}
+        while True:
+            ready, _, _ = select.select(by_fd, [], [])
+            for fd in ready:
+                for event in by_fd[fd].read():
+                    # value 2 is autorepeat, report it as another key down
+                    if event.type != ecodes.EV_KEY or event.value not in (0, 1, 2):
+                        continue
+                    name = self._names.get(event.code)
+                    if name is None:
+                        code_name = ecodes.KEY.get(event.code, str(event.code))
+                        if isinstance(code_name, list):
+                            code_name = code_name[0]
+                        name = self._names[event.code] = (_EVDEV_NAMES.get(code_name)
+                                                          or code_name.replace("KEY_", "").lower())
+                    self._dispatch(KeyEvent(name, KEY_UP if event.value == 0 else KEY_DOWN))
+
+
+class RecordingBackend(_HotkeyMatcher, InputBackend):
+    """In-memory backend that records every press/release with perf_counter_ns.
+
+    Nothing reaches the operating system, which makes it the backend to use
+    for headless benchmarks. inject() simulates a physical key event so hooks
+    and hotkeys can be exercised too.
+    """
+    name = "recording"
+
+    def __init__(self):
+        InputBackend.__init__(self)
+        _HotkeyMatcher.__init__(self)
+        self.events = []  # (perf_counter_ns, event_type, key)
+        self._clock = time.perf_counter_ns
+        # list.append is atomic, so no lock is needed on the emit path
+        self._append = self.events.append
+
+    def press(self, key):
+        self.held.add(key)
+        self._append((self._clock(), KEY_DOWN, key))
+
+    def release(self, key):
+        self._append((self._clock(), KEY_UP, key))
+        self.held.discard(key)
+
+    def clear(self):
+        del self.events[:]
+
+    def inject(self, key, event_type=KEY_DOWN):
+        """Pretend a physical key was pressed or released"""
+        self._dispatch(KeyEvent(key, event_type))
+
+
+# Termination signals that should not leave keys held; SIGINT already
+# raises KeyboardInterrupt, which the callers handle
+_RELEASE_SIGNALS = tuple(getattr(signal, name) for name in ("SIGTERM", "SIGHUP", "SIGBREAK")
+                         if hasattr(signal, name))
+
+
+def install_release_handlers(backend, on_signal=None):
+    """Release the backend's held keys at exit and on termination signals.
+
+    A signal handler releases the keys, then calls on_signal(signum) if
+    given (the GUI quits its event loop there), or else hands the signal on
+    to the handler that was installed before, or to the default action.
+    Signal handlers can only be set from the main thread; elsewhere only the
+    exit handler is installed.
+    """
+    atexit.register(backend.release_all)
+    if current_thread() is not main_thread():
+        return
+    for signum in _RELEASE_SIGNALS:
+        previous = signal.getsignal(signum)
+
+        def handler(signum, frame, previous=previous):
+            backend.release_all()
+            if on_signal is not None:
+                on_signal(signum)
+            elif callable(previous):
+                previous(signum, frame)
+            elif previous != signal.SIG_IGN:
+                signal.signal(signum, signal.SIG_DFL)
+                signal.raise_signal(signum)
+        try:
+            signal.signal(signum, handler)
+        except (OSError, ValueError) as e:
+            print(f"Could not handle signal {signum}: {e}")
+
+
+BACKENDS = {
+    KeyboardBackend.name: KeyboardBackend,
+    UInputBackend.name: UInputBackend,
+    RecordingBackend.name: RecordingBackend,
+}
+
+
+def default_backend_name():
+    """Pick the backend for this machine, AKH_BACKEND overrides the choice"""
+    return os.environ.get("AKH_BACKEND", KeyboardBackend.name)
+
+
+def get_backend(name=None):
+    """Create an input backend by name ('keyboard', 'uinput' or 'recording')"""
+    name = name or default_backend_name()
+    try:
+        backend_class = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown input backend: {name!r} "
+                         f"(choose from {', '.join(BACKENDS)})") from None
+    return backend_class()
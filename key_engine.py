@@ -0,0 +1,1222 @@
+"""Timing and pattern execution engine for Auto Key Holder.
+
+Nothing in here imports Qt, so the engine can be driven from the GUI threads,
+from the command line or from a benchmark without a display.
+"""
+import heapq
+import random
+import sys
+import time
+from array import array
+from itertools import count
+from queue import Empty, Queue, SimpleQueue
+from threading import Event, Lock, Thread, current_thread
+
+from pattern_io import REST_KEY, parse_duration, pattern_track
+
+# Timing modes
+TIMING_HIGH_PRECISION = "high_precision"
+TIMING_LOW_CPU = "low_cpu"
+TIMING_MODES = (TIMING_HIGH_PRECISION, TIMING_LOW_CPU)
+
+# How long before a deadline we stop sleeping and spin on the clock instead.
+# Windows wakes up in ~1 ms steps even with timeBeginPeriod(1), so it needs a
+# slightly wider window than Linux/macOS.
+SPIN_WINDOW_NS = {
+    TIMING_HIGH_PRECISION: 3_000_000 if sys.platform == "win32" else 1_500_000,
+    TIMING_LOW_CPU: 0,  # Rely on the OS timer only
+}
+
+# Jitter target per mode: a deadline reached later than this counts as a miss
+JITTER_TARGET_NS = {
+    TIMING_HIGH_PRECISION: 500_000,   # 0.5 ms
+    TIMING_LOW_CPU: 16_000_000,       # One default Windows timer tick
+}
+
+# When PatternRunner adopts a plan published while it runs
+SWAP_AT_STEP = "step"
+SWAP_AT_REPETITION = "repetition"
+
+# Roughly how many steps the duration sampler generates per batch
+DEFAULT_BLOCK_STEPS = 4096
+
+# How many steps a StepStream keeps compiled ahead of playback, and in what chunks
+DEFAULT_LOOKAHEAD_STEPS = 4096
+STREAM_CHUNK_STEPS = 256
+
+# How soon a stream track looks again when its reader has nothing ready
+STREAM_RETRY_NS = 1_000_000
+
+# If we fall behind by more than this (machine suspended, debugger paused...)
+# the schedule is re-anchored instead of firing every missed phase at once
+RESYNC_THRESHOLD_NS = 250_000_000
+
+# A scheduler this far past the deadline it is waiting for is considered
+# stuck, and SchedulerWatchdog releases every held key
+DEFAULT_STALL_NS = 1_000_000_000
+
+
+def _set_timer_resolution(enabled):
+    """Ask Windows for 1 ms timer resolution while high precision timing runs"""
+    if sys.platform != "win32":
+        return
+    try:
+        import ctypes
+        winmm = ctypes.WinDLL("winmm")
+        if enabled:
+            winmm.timeBeginPeriod(1)
+        else:
+            winmm.timeEndPeriod(1)
+    except Exception as e:
+        print(f"Could not change timer resolution: {e}")
+
+
+class DeadlineScheduler:
+    """Waits for absolute deadlines measured with time.perf_counter_ns().
+
+    Sources move their deadlines forward from where the previous phase was
+    *supposed* to end, not from where it actually ended, so lateness is
+    absorbed by the next phase instead of accumulating over a long pattern;
+    the scheduler driving them waits for each deadline with wait_until().
+    Waiting sleeps on the stop event until shortly before the deadline and,
+    in high precision mode, spins on the clock for the last stretch. Each
+    phase blocks once with its full remaining timeout rather than waking up
+    periodically to check for a stop; wakeups counts how often we actually
+    slept, so an idle hold can be checked to cost next to nothing.
+    """
+
+    def __init__(self, mode=TIMING_HIGH_PRECISION, stop_event=None):
+        if mode not in TIMING_MODES:
+            raise ValueError(f"Unknown timing mode: {mode}")
+        self.mode = mode
+        self.stop_event = stop_event if stop_event is not None else Event()
+        self.spin_window_ns = SPIN_WINDOW_NS[mode]
+        self.jitter_target_ns = JITTER_TARGET_NS[mode]
+        self._timer_resolution_set = False
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.deadlines_hit = 0
+        self.deadlines_missed = 0
+        self.total_lateness_ns = 0
+        self.max_lateness_ns = 0
+        self.resyncs = 0
+        self.wakeups = 0
+
+    def start(self, now_ns=None):
+        """Anchor the schedule at now (or at the given perf_counter_ns value)"""
+        if self.mode == TIMING_HIGH_PRECISION and not self._timer_resolution_set:
+            _set_timer_resolution(True)
+            self._timer_resolution_set = True
+        return time.perf_counter_ns() if now_ns is None else now_ns
+
+    def close(self):
+        if self._timer_resolution_set:
+            _set_timer_resolution(False)
+            self._timer_resolution_set = False
+
+    def resync(self, source, deadline_ns, now_ns):
+        """Move a source that is too far behind to catch up sensibly onto now.
+
+        Returns the source's new deadline, or None if deadline_ns is close
+        enough to now_ns to simply be late.
+        """
+        late_ns = now_ns - deadline_ns
+        if late_ns <= RESYNC_THRESHOLD_NS:
+            return None
+        self.resyncs += 1
+        source.deadline_ns += late_ns
+        return source.deadline_ns
+
+    def wait_until(self, deadline_ns):
+        """Block until deadline_ns. Returns False if the stop event is set first.
+
+        The EventScheduler passes its wake-up event, so a submit or cancel
+        interrupts the wait.
+        """
+        stop_event = self.stop_event
+        clock = time.perf_counter_ns
+
+        # Coarse phase: sleep on the stop event so a stop wakes us immediately
+        coarse_ns = deadline_ns - clock() - self.spin_window_ns
+        if coarse_ns > 0:
+            self.wakeups += 1
+            if stop_event.wait(coarse_ns / 1_000_000_000):
+                return False
+        elif stop_event.is_set():
+            return False
+
+        # Fine phase; a request still gets through while we spin
+        if self.spin_window_ns:
+            while clock() < deadline_ns:
+                if stop_event.is_set():
+                    return False
+        else:
+            # Timed waits can return slightly early, top up until we are there
+            remaining_ns = deadline_ns - clock()
+            while remaining_ns > 0:
+                self.wakeups += 1
+                if stop_event.wait(remaining_ns / 1_000_000_000):
+                    return False
+                remaining_ns = deadline_ns - clock()
+
+        self.record_lateness(clock() - deadline_ns)
+        return not stop_event.is_set()
+
+    def record_lateness(self, lateness_ns):
+        if lateness_ns <= self.jitter_target_ns:
+            self.deadlines_hit += 1
+        else:
+            self.deadlines_missed += 1
+        self.total_lateness_ns += lateness_ns
+        if lateness_ns > self.max_lateness_ns:
+            self.max_lateness_ns = lateness_ns
+
+    def stats(self):
+        """Summary of how well deadlines were met so far"""
+        count = self.deadlines_hit + self.deadlines_missed
+        return {
+            "mode": self.mode,
+            "deadlines": count,
+            "missed": self.deadlines_missed,
+            "jitter_target_ms": self.jitter_target_ns / 1e6,
+            "mean_lateness_ms": (self.total_lateness_ns / count / 1e6) if count else 0.0,
+            "max_lateness_ms": self.max_lateness_ns / 1e6,
+            "resyncs": self.resyncs,
+            "wakeups": self.wakeups,
+            "within_target": self.deadlines_missed == 0,
+        }
+
+
+class PatternPlan:
+    """Compiled, read-only form of a pattern list.
+
+    Durations live in parallel array('d') columns and keys are stored once in
+    a key table and referenced by index, so the run loop only does indexed
+    reads. Plans are never modified after compile_patterns() builds them;
+    a changed pattern list gets a new plan.
+    """
+    __slots__ = ('keys', 'key_index', 'hold_min', 'hold_max', 'wait_min', 'wait_max',
+                 'min_cycle_seconds')
+
+    def __init__(self, keys, key_index, hold_min, hold_max, wait_min, wait_max):
+        self.keys = keys
+        self.key_index = key_index
+        self.hold_min = hold_min
+        self.hold_max = hold_max
+        self.wait_min = wait_min
+        self.wait_max = wait_max
+        # Shortest possible time one pass through the plan can take
+        self.min_cycle_seconds = sum(hold_min) + sum(wait_min)
+
+    def __len__(self):
+        return len(self.key_index)
+
+
+def compile_patterns(patterns):
+    """Compile (key, hold, wait) pattern tuples into a PatternPlan.
+
+    Invalid steps are reported and skipped, the rest of the pattern still runs.
+    """
+    keys = []
+    key_table = {}
+    key_index = array('I')
+    hold_min = array('d')
+    hold_max = array('d')
+    wait_min = array('d')
+    wait_max = array('d')
+
+    for pattern in patterns:
+        try:
+            key = pattern[0]
+            hold = parse_duration(pattern[1])
+            wait = parse_duration(pattern[2])
+        except (ValueError, IndexError, TypeError) as e:
+            print(f"Error processing pattern {pattern}: {e}")
+            continue
+
+        index = key_table.get(key)
+        if index is None:
+            index = key_table[key] = len(keys)
+            keys.append(sys.intern(key) if isinstance(key, str) else key)
+        key_index.append(index)
+        hold_min.append(hold[0])
+        hold_max.append(hold[1])
+        wait_min.append(wait[0])
+        wait_max.append(wait[1])
+
+    return PatternPlan(tuple(keys), key_index, hold_min, hold_max, wait_min, wait_max)
+
+
+EMPTY_PLAN = compile_patterns([])
+
+
+def compile_tracks(patterns):
+    """Compile pattern tuples into a {track number: PatternPlan} dict"""
+    by_track = {}
+    for pattern in patterns:
+        try:
+            number = pattern_track(pattern)
+        except (ValueError, TypeError) as e:
+            print(f"Error processing pattern {pattern}: {e}")
+            continue
+        by_track.setdefault(number, []).append(pattern)
+    return {number: compile_patterns(by_track[number]) for number in sorted(by_track)}
+
+
+def _numbered_plans(plans):
+    # A single plan or stream, a list for tracks 1, 2, ... or a {number: plan} dict
+    if isinstance(plans, (PatternPlan, StepStream)):
+        return {1: plans}
+    if isinstance(plans, dict):
+        return dict(plans)
+    return {number: plan for number, plan in enumerate(plans, 1)}
+
+
+def track_seed(seed, track=0, swap=0):
+    """Seed for a track (counted from 0) after a number of plan swaps.
+
+    Track 0 with no swaps uses the seed itself, so a single-track pattern
+    replays with exactly the seed that was shown.
+    """
+    if not track and not swap:
+        return seed
+    return (seed + track * 0x9E3779B1 + swap * 0x85EBCA77) % 2 ** 32
+
+
+def _load_numpy():
+    """Import NumPy on first use; it is optional and slow to import"""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+class _RefillWorker:
+    """Single background thread that tops up DurationSampler buffers"""
+
+    def __init__(self):
+        self._queue = SimpleQueue()
+        self._thread = None
+        self._lock = Lock()
+
+    def submit(self, sampler):
+        with self._lock:
+            if self._thread is None:
+                self._thread = Thread(target=self._run, name="DurationRefill", daemon=True)
+                self._thread.start()
+        self._queue.put(sampler)
+
+    def _run(self):
+        while True:
+            sampler = self._queue.get()
+            try:
+                sampler._prefill()
+            except Exception as e:
+                print(f"Error pre-sampling durations: {e}")
+
+
+_refill_worker = _RefillWorker()
+
+
+class DurationSampler:
+    """Pre-samples hold and wait durations for whole repetitions at a time.
+
+    Each call to next_block() returns (holds, waits) lists covering one or more
+    complete passes through the plan, so the run loop never calls the RNG.
+    The following block is generated on a shared background thread while the
+    current one is being played. The first block covers a single repetition,
+    so creating a track costs one pass over its plan however long the blocks
+    are (hundreds of patterns can start at once). Blocks are always produced
+    in order from a
+    single seeded generator, so the same seed replays the same durations
+    (NumPy and the pure Python fallback produce different sequences).
+    """
+
+    def __init__(self, plan, seed=None, block_steps=DEFAULT_BLOCK_STEPS, use_numpy=True):
+        self.plan = plan
+        self.seed = seed if seed is not None else random.SystemRandom().randrange(2 ** 32)
+        self.reps_per_block = max(1, block_steps // max(1, len(plan)))
+        self.randomized = any(plan.hold_min[i] != plan.hold_max[i] or
+                              plan.wait_min[i] != plan.wait_max[i]
+                              for i in range(len(plan)))
+        self._lock = Lock()
+        self._ready = None
+        self._started = False  # Set once the first, one-repetition block is out
+
+        if not self.randomized:
+            # Nothing to sample, every pass uses the same durations
+            self._fixed = (plan.hold_min.tolist(), plan.wait_min.tolist())
+            return
+
+        np = _load_numpy() if use_numpy else None
+        self._np = np
+        if np is not None:
+            reps = self.reps_per_block
+            self._rng = np.random.default_rng(self.seed)
+            self._first_bounds = ((np.frombuffer(plan.hold_min), np.frombuffer(plan.hold_max)),
+                                  (np.frombuffer(plan.wait_min), np.frombuffer(plan.wait_max)))
+            self._hold_bounds = (np.tile(np.frombuffer(plan.hold_min), reps),
+                                 np.tile(np.frombuffer(plan.hold_max), reps))
+            self._wait_bounds = (np.tile(np.frombuffer(plan.wait_min), reps),
+                                 np.tile(np.frombuffer(plan.wait_max), reps))
+        else:
+            self._rng = random.Random(self.seed)
+
+    def next_block(self):
+        """Return (holds, waits) for the next reps_per_block passes"""
+        if not self.randomized:
+            return self._fixed
+        with self._lock:
+            block = self._ready
+            self._ready = None
+            if not self._started:
+                self._started = True
+                block = self._generate(1)
+            elif block is None:
+                # Background refill fell behind, generate in place
+                block = self._generate()
+        _refill_worker.submit(self)
+        return block
+
+    def _prefill(self):
+        with self._lock:
+            if self._ready is None:
+                self._ready = self._generate()
+
+    def _generate(self, reps=None):
+        # reps=1 for the first block; the split is fixed, so a seed still
+        # replays the same durations
+        if self._np is not None:
+            if reps == 1:
+                hold_bounds, wait_bounds = self._first_bounds
+            else:
+                hold_bounds, wait_bounds = self._hold_bounds, self._wait_bounds
+            holds = self._rng.uniform(*hold_bounds)
+            waits = self._rng.uniform(*wait_bounds)
+            return holds.tolist(), waits.tolist()
+
+        plan = self.plan
+        uniform = self._rng.uniform
+        holds = []
+        waits = []
+        bounds = list(zip(plan.hold_min, plan.hold_max, plan.wait_min, plan.wait_max))
+        for _ in range(reps or self.reps_per_block):
+            for hold_low, hold_high, wait_low, wait_high in bounds:
+                holds.append(hold_low if hold_low == hold_high else uniform(hold_low, hold_high))
+                waits.append(wait_low if wait_low == wait_high else uniform(wait_low, wait_high))
+        return holds, waits
+
+
+class PatternTrack:
+    """One channel of a multi-track pattern, played as a small state machine.
+
+    A track alternates between two states: waiting to press its next step's
+    key and holding it. fire() performs the due press or release and returns
+    the perf_counter_ns at which the track wants to fire next, or None once
+    it is finished, so a single scheduler can interleave any number of
+    tracks without giving each its own thread.
+    """
+
+    def __init__(self, number, plan, repetitions=1, seed=None, swap_at=SWAP_AT_STEP):
+        self.number = number
+        self.repetitions = repetitions
+        self.swap_every_step = swap_at == SWAP_AT_STEP
+        self.sampler = DurationSampler(plan, seed)
+        self.seed = self.sampler.seed
+        self.completed_reps = 0
+        self.plan_swaps = 0
+        self.finished = not len(plan) or repetitions == 0
+        self.emptied = False       # Finished because an empty plan was published
+        self.held_key = None       # Key currently pressed by this track
+        self.deadline_ns = None    # When fire() is due next
+        self._pending_plan = None  # Written by publish_plan(), taken between steps
+        self._step = 0
+        self._wait_ns = 0
+        self._use_plan(plan)
+
+    def _use_plan(self, plan):
+        # Bind what fire() touches, so a step costs a few indexed reads
+        self.plan = plan
+        self._keys = plan.keys
+        self._key_index = plan.key_index
+        self._step_count = len(plan)
+        self._spins_without_delay = plan.min_cycle_seconds <= 0
+        self._holds, self._waits = self.sampler.next_block()
+        self._position = self._step
+
+    def start(self, anchor_ns):
+        self.deadline_ns = anchor_ns
+
+    def publish_plan(self, plan):
+        """Replace the plan at the next step (or repetition) boundary"""
+        self._pending_plan = plan
+
+    def fire(self, press, release):
+        """Perform the press or release that is due. Returns the next deadline or None."""
+        if self.held_key is not None:
+            key = self.held_key
+            self.held_key = None
+            try:
+                release(key)
+            except Exception as e:
+                print(f"Error executing pattern: {str(e)}")
+            self.deadline_ns += self._wait_ns
+            self._next_step()
+            return self.deadline_ns
+
+        if self.finished:
+            if not (self.emptied and self._pending_plan is not None):
+                return None
+            # Rows came back while the emptied track waited out its last step
+            self.finished = self.emptied = False
+            self._adopt_pending_plan()
+            if self.finished:
+                return None
+
+        # Blocks always hold whole repetitions, so only check at the start of one
+        if self._step == 0 and self._position >= len(self._holds):
+            self._holds, self._waits = self.sampler.next_block()
+            self._position = 0
+        position = self._position
+        self._position = position + 1
+        hold_ns = round(self._holds[position] * 1_000_000_000)
+        self._wait_ns = round(self._waits[position] * 1_000_000_000)
+
+        key = self._keys[self._key_index[self._step]]
+        if key == REST_KEY:
+            # A rest step presses nothing for its hold and wait
+            self.deadline_ns += hold_ns + self._wait_ns
+            self._next_step()
+            return self.deadline_ns
+        try:
+            press(key)
+            self.held_key = key
+        except Exception as e:
+            # Keep the step's timing so a bad key cannot make the track spin
+            print(f"Error executing pattern: {str(e)}")
+            self.deadline_ns += hold_ns + self._wait_ns
+            self._next_step()
+            return self.deadline_ns
+        self.deadline_ns += hold_ns
+        return self.deadline_ns
+
+    def _next_step(self):
+        self._step += 1
+        if self._step == self._step_count:
+            # One repetition complete
+            self._step = 0
+            self.completed_reps += 1
+            if self.repetitions != -1 and self.completed_reps >= self.repetitions:
+                # Takes effect at the next press, after the final wait
+                self.finished = True
+                return
+            # A repetition with no hold or wait time would spin the CPU,
+            # so yield briefly and re-anchor the track afterwards
+            if self._spins_without_delay:
+                self.deadline_ns = max(self.deadline_ns, time.perf_counter_ns() + 1_000_000)
+
+        # Adopt an edited plan between steps; no key is held here
+        if self._pending_plan is not None and (self.swap_every_step or self._step == 0):
+            self._adopt_pending_plan()
+
+    def _adopt_pending_plan(self):
+        plan = self._pending_plan
+        self._pending_plan = None
+        self.plan_swaps += 1
+        if not len(plan):
+            self.finished = True
+            self.emptied = True
+            return
+        # Derive the seed so a replayed run with the same edits stays identical
+        self.sampler = DurationSampler(plan, track_seed(self.seed, swap=self.plan_swaps))
+        if self._step >= len(plan):
+            self._step = 0  # The plan got shorter than where we were
+        # Continue from the same step of the new plan's first block
+        self._use_plan(plan)
+
+
+def _bounds(value):
+    # A (min, max) pair, or anything parse_duration() accepts
+    if isinstance(value, tuple):
+        low, high = value
+        return float(low), float(high)
+    return parse_duration(value)
+
+
+class StepStream:
+    """Steps read from an iterator while they play, with bounded memory.
+
+    Use it in place of a PatternPlan for a track whose steps are too many to
+    hold in memory, such as a long recorded session or a generated script.
+    A background thread pulls steps from the source, samples their durations
+    and keeps up to lookahead of them ready in chunks, so slow file I/O is
+    absorbed long before a step is due. Playback never waits for the reader:
+    a track that finds nothing ready tries again shortly, and underruns
+    counts the times that happened. PatternRunner primes its streams, so
+    the first chunk is read before the track's schedule is anchored.
+
+    steps is an iterable of (key, hold, wait) steps, where hold and wait are
+    seconds, "min-max" strings or (min, max) pairs. To repeat, pass a
+    function returning a fresh iterable instead; it is called once per
+    repetition.
+    """
+
+    def __init__(self, steps, repetitions=1, seed=None, lookahead=DEFAULT_LOOKAHEAD_STEPS,
+                 chunk_steps=STREAM_CHUNK_STEPS):
+        if not callable(steps):
+            if repetitions != 1:
+                raise ValueError("Repeating a stream needs a function that returns the steps")
+            source = steps
+            steps = lambda: source
+        self._steps = steps
+        self.repetitions = repetitions
+        self.seed = seed
+        self.chunk_steps = chunk_steps
+        self._chunks = Queue(maxsize=max(1, lookahead // chunk_steps))
+        self._thread = None
+        self._closed = False
+        self._ready = Event()  # Set once the first chunk (or the end) is queued
+        self._starved = False
+        self.underruns = 0
+        self.steps_read = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = Thread(target=self._read, name="StepStream", daemon=True)
+            self._thread.start()
+
+    def prime(self, timeout=None):
+        """Start reading and wait for the first chunk. Returns False on timeout."""
+        self.start()
+        return self._ready.wait(timeout)
+
+    def next_chunk(self):
+        """Next list of (key, hold seconds, wait seconds), None at the end,
+        or an empty tuple if the reader has nothing ready yet (never blocks)"""
+        try:
+            chunk = self._chunks.get_nowait()
+        except Empty:
+            if not self._starved:
+                self._starved = True
+                self.underruns += 1
+            return ()
+        self._starved = False
+        return chunk
+
+    def close(self):
+        """Stop reading; the reader thread exits at its next step"""
+        self._closed = True
+        try:
+            while True:
+                self._chunks.get_nowait()  # Unblock a reader waiting for room
+        except Empty:
+            pass
+
+    def _read(self):
+        uniform = random.Random(self.seed).uniform
+        intern = sys.intern
+        put = self._chunks.put
+        starving = self._chunks.empty
+        chunk = []
+        completed_reps = 0
+        try:
+            while self.repetitions == -1 or completed_reps < self.repetitions:
+                for step in self._steps():
+                    if self._closed:
+                        return
+                    try:
+                        key = step[0]
+                        hold_low, hold_high = _bounds(step[1])
+                        wait_low, wait_high = _bounds(step[2])
+                    except (ValueError, IndexError, TypeError) as e:
+                        print(f"Error processing pattern {step}: {e}")
+                        continue
+                    chunk.append((intern(key) if isinstance(key, str) else key,
+                                  hold_low if hold_low == hold_high else uniform(hold_low, hold_high),
+                                  wait_low if wait_low == wait_high else uniform(wait_low, wait_high)))
+                    self.steps_read += 1
+                    # Hand over early when playback has nothing left, so a
+                    # slow source still plays step by step
+                    if len(chunk) >= self.chunk_steps or starving():
+                        put(chunk)
+                        chunk = []
+                        self._ready.set()
+                completed_reps += 1
+        except Exception as e:
+            print(f"Error reading pattern steps: {e}")
+        finally:
+            if not self._closed:
+                if chunk:
+                    put(chunk)
+                put(None)
+            self._ready.set()
+
+
+class StreamTrack:
+    """A track that plays a StepStream; the stream-fed sibling of PatternTrack"""
+    plan = EMPTY_PLAN
+    plan_swaps = 0
+    emptied = False
+
+    def __init__(self, number, stream):
+        self.number = number
+        self.stream = stream
+        self.finished = False
+        self.completed_reps = 0
+        self.held_key = None
+        self.deadline_ns = None
+        self._chunk = ()
+        self._position = 0
+        self._wait_ns = 0
+
+    def start(self, anchor_ns):
+        self.deadline_ns = anchor_ns
+        self.stream.start()
+
+    def publish_plan(self, plan):
+        pass  # Streams play as read; edits apply to the next run
+
+    def fire(self, press, release):
+        if self.held_key is not None:
+            key = self.held_key
+            self.held_key = None
+            try:
+                release(key)
+            except Exception as e:
+                print(f"Error executing pattern: {str(e)}")
+            self.deadline_ns += self._wait_ns
+            return self.deadline_ns
+
+        if self.finished:
+            return None
+        if self._position >= len(self._chunk):
+            chunk = self.stream.next_chunk()
+            if chunk is None:
+                self.finished = True
+                self.completed_reps = self.stream.repetitions
+                return None
+            if not chunk:
+                # The reader is behind: look again shortly rather than block
+                # the scheduler thread that every other job shares
+                self.deadline_ns = max(self.deadline_ns, time.perf_counter_ns() + STREAM_RETRY_NS)
+                return self.deadline_ns
+            self._chunk = chunk
+            self._position = 0
+        key, hold, wait = self._chunk[self._position]
+        self._position += 1
+        hold_ns = round(hold * 1_000_000_000)
+        self._wait_ns = round(wait * 1_000_000_000)
+        if key == REST_KEY:
+            self.deadline_ns += hold_ns + self._wait_ns
+            return self.deadline_ns
+        try:
+            press(key)
+            self.held_key = key
+        except Exception as e:
+            print(f"Error executing pattern: {str(e)}")
+            self.deadline_ns += hold_ns + self._wait_ns
+            return self.deadline_ns
+        self.deadline_ns += hold_ns
+        return self.deadline_ns
+
+
+class ScheduledJob:
+    """Something the EventScheduler plays: a pattern, a constant hold, ...
+
+    A job hands the scheduler sources: objects with a track number, a
+    deadline_ns, the key they currently hold (held_key) and a
+    fire(press, release) method that performs the due action and returns the
+    next deadline, or None once the source has nothing left to do.
+    """
+    timing_mode = TIMING_HIGH_PRECISION
+
+    def __init__(self):
+        self.scheduler = None
+        self.seq = None         # Submission order, breaks ties between jobs
+        self.on_done = None     # Called as on_done(job, completed) on the scheduler thread
+        self.on_start = None    # Called as on_start(job) on the scheduler thread
+        self.requested_ns = None  # perf_counter_ns of the hotkey press that asked for the job, if any
+        self.done = False
+        self.completed = None   # True if the job finished on its own, False if cancelled
+        self.timer = None
+        self.anchor_ns = None     # perf_counter_ns the job started at
+        self.timing_stats = None  # Filled in with deadline statistics when done
+        self.cancel_requested_ns = None  # perf_counter_ns of the first cancel()
+        self.released_ns = None   # perf_counter_ns once a cancelled job let go of its keys
+        self._done_event = Event()
+
+    def start(self, now_ns):
+        """Begin at now_ns and return the sources to schedule"""
+        raise NotImplementedError
+
+    def refresh(self, now_ns):
+        """Called after scheduler.refresh(job); returns sources that should start now"""
+        return ()
+
+    def source_finished(self, source):
+        """A source returned None from fire(). Return True if the whole job is done."""
+        return True
+
+    def held_keys(self):
+        """Keys the job's sources hold down right now, released if it is cancelled"""
+        return ()
+
+    def close(self):
+        """Called once the job is done, however it ended"""
+
+    def cancel(self):
+        """Ask the scheduler to stop the job; returns at once (see wait() and on_done)"""
+        if self.cancel_requested_ns is None:
+            self.cancel_requested_ns = time.perf_counter_ns()
+        if self.scheduler is not None:
+            self.scheduler.cancel(self)
+
+    @property
+    def stop_latency_ns(self):
+        """Time from cancel() to the job's keys being released, once it has stopped"""
+        if self.cancel_requested_ns is None or self.released_ns is None:
+            return None
+        return self.released_ns - self.cancel_requested_ns
+
+    def wait(self, timeout=None):
+        """Block until the job is done. Returns False on timeout."""
+        return self._done_event.wait(timeout)
+
+
+class ConstantHold(ScheduledJob):
+    """Presses a key and holds it until cancelled"""
+    timing_mode = TIMING_LOW_CPU  # Nothing is timed after the press
+
+    def __init__(self, key):
+        super().__init__()
+        self.key = key
+        self.number = 1
+        self.held_key = None
+        self.deadline_ns = None
+        self.error = None  # Why the key could not be pressed, if it could not
+
+    def start(self, now_ns):
+        self.deadline_ns = now_ns
+        return (self,)
+
+    def fire(self, press, release):
+        try:
+            press(self.key)
+            self.held_key = self.key
+        except Exception as e:
+            print(f"Error holding key {self.key!r}: {e}")
+            self.error = e
+        return None
+
+    def source_finished(self, source):
+        return self.error is not None  # Otherwise held until cancelled
+
+    def held_keys(self):
+        return (self.held_key,) if self.held_key is not None else ()
+
+
+# Requests handed to the scheduler thread
+_SUBMIT, _CANCEL, _REFRESH = range(3)
+
+
+class EventScheduler:
+    """Plays every timed key press and release from one priority queue.
+
+    Jobs are submitted and cancelled from any thread, and the scheduler
+    thread does all the input emission, so any number of simultaneous jobs
+    cost one thread. Actions due at the same instant fire releases first,
+    then in submission order, then in track order, so the interleaving of
+    jobs is the same on every run.
+
+    start() runs the scheduler on its own thread; run() plays jobs on the
+    calling thread instead.
+    """
+
+    def __init__(self, backend, name="EventScheduler"):
+        self.backend = backend
+        self.name = name
+        self._heap = []   # (deadline_ns, is_press, job seq, track number, source, job)
+        self._jobs = {}   # seq -> job, for jobs that are started and not done
+        self._requests = []
+        self._lock = Lock()
+        self._wakeup = Event()
+        self._next_seq = count(1).__next__
+        self._thread = None
+        self._looping = False
+        self._shutdown = False
+        self.idle_wakeups = 0  # Times the thread woke up with nothing scheduled
+        self.due_ns = None  # When the loop must next be back, None while idle
+
+    def start(self):
+        """Run the scheduler on its own daemon thread"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = Thread(target=self.run, name=self.name, daemon=True)
+                self._thread.start()
+        return self
+
+    def submit(self, job):
+        """Start a job as soon as possible (callable from any thread). Returns the job."""
+        self._request(_SUBMIT, job)
+        return job
+
+    def cancel(self, job):
+        """Stop a job and release its keys (callable from any thread)"""
+        self._request(_CANCEL, job)
+
+    def refresh(self, job):
+        """Tell the scheduler a job has changed, e.g. it was given new plans"""
+        self._request(_REFRESH, job)
+
+    def shutdown(self, timeout=None):
+        """Cancel every job and stop the scheduler thread"""
+        self._shutdown = True
+        self._wakeup.set()
+        if self._thread is not None and self._thread is not current_thread():
+            self._thread.join(timeout)
+
+    def _request(self, kind, job):
+        with self._lock:
+            if kind == _SUBMIT:
+                job.scheduler = self
+                job.seq = self._next_seq()
+            self._requests.append((kind, job))
+            looping = self._looping
+        if looping:
+            self._wakeup.set()
+        elif kind == _CANCEL:
+            # Nothing is running the loop (it exited, e.g. on Ctrl+C), clean up here
+            self._handle_requests()
+
+    def run(self, until_idle=False):
+        """Play jobs until shutdown(), or until no job is left if until_idle"""
+        heap = self._heap
+        heappop = heapq.heappop
+        wakeup = self._wakeup
+        press, release = self.backend.press, self.backend.release
+        clock = time.perf_counter_ns
+        with self._lock:
+            self._looping = True
+        try:
+            while not self._shutdown:
+                wakeup.clear()
+                if self._requests:
+                    self._handle_requests()
+                if not heap:
+                    if until_idle and not self._jobs:
+                        break
+                    self.due_ns = None
+                    wakeup.wait()
+                    self.due_ns = clock()
+                    self.idle_wakeups += 1
+                    continue
+
+                deadline_ns, _, _, _, source, job = heap[0]
+                if job.done:
+                    heappop(heap)  # Left behind by a cancelled job
+                    continue
+
+                resynced_ns = job.timer.resync(source, deadline_ns, clock())
+                if resynced_ns is not None:
+                    heappop(heap)
+                    self._schedule(job, source, resynced_ns)
+                    continue
+
+                self.due_ns = deadline_ns
+                if not job.timer.wait_until(deadline_ns):
+                    continue  # Woken up by a request
+
+                heappop(heap)
+                try:
+                    next_deadline_ns = source.fire(press, release)
+                except Exception as e:
+                    # One broken job must not take the shared thread down with it
+                    print(f"Error in scheduled job, stopping it: {e}")
+                    self._finish(job, False)
+                    continue
+                if next_deadline_ns is not None:
+                    self._schedule(job, source, next_deadline_ns)
+                elif job.source_finished(source):
+                    self._finish(job, True)
+        finally:
+            self.due_ns = None
+            with self._lock:
+                self._looping = False
+            if self._shutdown:
+                for job in list(self._jobs.values()):
+                    self._finish(job, False)
+
+    def _schedule(self, job, source, deadline_ns):
+        heapq.heappush(self._heap, (deadline_ns, source.held_key is None, job.seq,
+                                    source.number, source, job))
+
+    def _handle_requests(self):
+        with self._lock:
+            requests = self._requests
+            self._requests = []
+        for kind, job in requests:
+            if kind == _SUBMIT:
+                self._start_job(job)
+            elif job.seq in self._jobs:
+                if kind == _CANCEL:
+                    self._finish(job, False)
+                else:
+                    for source in job.refresh(time.perf_counter_ns()):
+                        self._schedule(job, source, source.deadline_ns)
+
+    def _start_job(self, job):
+        # All of a job's actions are scheduled against absolute deadlines
+        job.timer = DeadlineScheduler(job.timing_mode, self._wakeup)
+        job.anchor_ns = job.timer.start()
+        self._jobs[job.seq] = job
+        sources = job.start(job.anchor_ns)
+        for source in sources:
+            self._schedule(job, source, source.deadline_ns)
+        if job.on_start is not None:
+            try:
+                job.on_start(job)
+            except Exception as e:
+                print(f"Error in job start callback: {e}")
+        if not sources:
+            # Nothing to play, or stopped before the scheduler got to it
+            self._finish(job, job.cancel_requested_ns is None)
+
+    def _finish(self, job, completed):
+        del self._jobs[job.seq]
+        job.done = True
+        job.completed = completed
+        if not completed:
+            # Only what is down right now: one release per held key, however long the pattern
+            held = self.backend.held
+            for key in job.held_keys():
+                if key not in held:
+                    continue  # Already released, e.g. by the watchdog
+                try:
+                    self.backend.release(key)
+                except Exception:
+                    pass
+            job.released_ns = time.perf_counter_ns()
+        job.timing_stats = job.timer.stats()
+        job.timer.close()
+        job.close()
+        job._done_event.set()
+        if job.on_done is not None:
+            try:
+                job.on_done(job, completed)
+            except Exception as e:
+                print(f"Error in job completion callback: {e}")
+
+
+class SchedulerWatchdog:
+    """Releases every held key if an EventScheduler stops keeping its deadlines.
+
+    The scheduler notes in due_ns when its loop must next be back. If that
+    moment is more than stall_ns behind, or the scheduler thread died while
+    jobs were running, the watchdog calls the backend's release_all() once
+    per stall and on_stall(released keys), if given, on its own thread.
+    It checks a few times per stall_ns, so an idle scheduler costs it only
+    those wakeups.
+    """
+
+    def __init__(self, scheduler, stall_ns=DEFAULT_STALL_NS, on_stall=None):
+        self.scheduler = scheduler
+        self.stall_ns = stall_ns
+        self.on_stall = on_stall
+        self.stalls = 0
+        self._stop = Event()
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = Thread(target=self._run, name=f"{self.scheduler.name}-watchdog",
+                                  daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stalled(self, now_ns=None):
+        scheduler = self.scheduler
+        thread = scheduler._thread
+        if thread is not None and not thread.is_alive():
+            return bool(scheduler._jobs) and not scheduler._shutdown
+        due_ns = scheduler.due_ns
+        if due_ns is None:
+            return False
+        now_ns = time.perf_counter_ns() if now_ns is None else now_ns
+        return now_ns - due_ns > self.stall_ns
+
+    def _run(self):
+        interval = self.stall_ns / 4 / 1_000_000_000
+        tripped = False
+        while not self._stop.wait(interval):
+            if not self.stalled():
+                tripped = False
+                continue
+            if tripped:
+                continue  # Released already; wait for the scheduler to recover
+            tripped = True
+            self.stalls += 1
+            released = self.scheduler.backend.release_all()
+            print(f"Scheduler stalled, released {len(released)} held key(s)")
+            if self.on_stall is not None:
+                try:
+                    self.on_stall(released)
+                except Exception as e:
+                    print(f"Error in stall callback: {e}")
+
+
+class PatternRunner(ScheduledJob):
+    """Plays one or more PatternPlans through an input backend.
+
+    Each plan is a track with its own steps, and tracks run concurrently, so
+    a track can hold Shift while another taps W. The runner is a job for an
+    EventScheduler: submit it to a shared scheduler, or call run() to play
+    it on the calling thread (the command line runner and the benchmarks do).
+    A track can also be a StepStream, whose steps are read while it plays.
+
+    A running pattern can be edited: publish_plans() drops new plans into a
+    single slot and each track adopts its plan at its next step (or
+    repetition) boundary, keeping its deadline schedule, so there is no gap
+    in timing.
+    """
+
+    def __init__(self, plans, backend, repetitions=1, timing_mode=TIMING_HIGH_PRECISION,
+                 seed=None, swap_at=SWAP_AT_STEP):
+        super().__init__()
+        if timing_mode not in TIMING_MODES:
+            raise ValueError(f"Unknown timing mode: {timing_mode}")
+        self.backend = backend
+        self.repetitions = repetitions
+        self.timing_mode = timing_mode
+        self.swap_at = swap_at
+        self.running = True
+        self.seed = seed if seed is not None else random.SystemRandom().randrange(2 ** 32)
+        self.tracks = {}
+        for number, plan in self._primed(_numbered_plans(plans)).items():
+            self.tracks[number] = self._new_track(number, plan)
+        self._live_tracks = set()
+        self._pending_plans = None  # Written by publish_plans(), taken on the scheduler thread
+
+    def _primed(self, plans):
+        # Read the first chunk of every stream on the caller's thread, so the
+        # scheduler never starts a stream track with nothing to play
+        for number, plan in plans.items():
+            if isinstance(plan, StepStream):
+                if plan.seed is None:
+                    plan.seed = track_seed(self.seed, number - 1)
+                plan.prime()
+        return plans
+
+    def _new_track(self, number, plan):
+        if isinstance(plan, StepStream):
+            return StreamTrack(number, plan)
+        # Random durations are drawn in batches, off the timing loop
+        return PatternTrack(number, plan, self.repetitions,
+                            track_seed(self.seed, number - 1), self.swap_at)
+
+    @property
+    def plan(self):
+        """Plan of the first track"""
+        first = min(self.tracks, default=None)
+        return self.tracks[first].plan if first is not None else EMPTY_PLAN
+
+    @property
+    def completed_reps(self):
+        """Repetitions completed by every track"""
+        return min((track.completed_reps for track in self.tracks.values()), default=0)
+
+    @property
+    def plan_swaps(self):
+        return max((track.plan_swaps for track in self.tracks.values()), default=0)
+
+    def publish_plan(self, plan):
+        """Hand the running pattern a new single-track plan (callable from any thread)"""
+        self.publish_plans([plan])
+
+    def publish_plans(self, plans):
+        """Hand the running pattern new plans (callable from any thread).
+
+        Takes a list of plans for tracks 1, 2, ... or a {track number: plan}
+        dict. If several sets are published before the scheduler picks them
+        up, the last one wins. Tracks missing from the new set finish at
+        their next boundary.
+        """
+        self._pending_plans = self._primed(_numbered_plans(plans))
+        if self.scheduler is not None:
+            self.scheduler.refresh(self)
+
+    def run(self):
+        """Play on the calling thread until every track is done or stop() is called.
+
+        Returns True if the pattern finished on its own, False if it was stopped.
+        """
+        scheduler = EventScheduler(self.backend, f"{type(self).__name__}-{id(self):x}")
+        scheduler.submit(self)
+        scheduler.run(until_idle=True)
+        return bool(self.completed)
+
+    def start(self, now_ns):
+        if not self.running:
+            return ()
+        sources = [track for track in self.tracks.values() if not track.finished]
+        if not sources:
+            print("No patterns to execute")
+        for track in sources:
+            track.start(now_ns)
+            self._live_tracks.add(track.number)
+        return sources
+
+    def refresh(self, now_ns):
+        plans = self._pending_plans
+        self._pending_plans = None
+        if plans is None:
+            return ()
+        started = []
+        for number, track in self.tracks.items():
+            if number not in plans:
+                track.publish_plan(EMPTY_PLAN)
+        for number, plan in plans.items():
+            track = self.tracks.get(number)
+            restart = track is not None and track.emptied and number not in self._live_tracks
+            if track is not None and track.deadline_ns is not None and not restart:
+                # Started tracks switch over at their next boundary
+                track.publish_plan(plan)
+            elif len(plan):
+                # A new track, one that had no steps, or one whose rows were
+                # all removed (it has left the schedule) starts right away
+                track = self.tracks[number] = self._new_track(number, plan)
+                track.start(now_ns)
+                self._live_tracks.add(number)
+                started.append(track)
+        return started
+
+    def source_finished(self, source):
+        self._live_tracks.discard(source.number)
+        return not self._live_tracks
+
+    def held_keys(self):
+        # Tracks holding the same key share one release
+        return {track.held_key for track in self.tracks.values() if track.held_key is not None}
+
+    def close(self):
+        for track in self.tracks.values():
+            if isinstance(track, StreamTrack):
+                track.stream.close()
+
+    def stop(self):
+        self.running = False
+        self.cancel()
@@ -0,0 +1,1259 @@
+import sys
+import json
+import signal
+import socket
+import time
+from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
+                            QHBoxLayout, QLabel, QLineEdit, QPushButton,
+                            QRadioButton, QButtonGroup, QSpinBox,
+                            QDoubleSpinBox, QGroupBox, QStackedWidget,
+                            QComboBox, QMessageBox, QInputDialog, QDialog, QCheckBox,
+                            QTableView, QAbstractItemView, QHeaderView)
+from PyQt6.QtCore import (QAbstractTableModel, QModelIndex, QObject, QSocketNotifier, QTimer,
+                          pyqtSignal, Qt)
+from PyQt6.QtGui import QFont
+
+from hotkeys import HotkeyDispatcher, HotkeyRegistry, HotkeyTable
+from input_backends import get_backend, install_release_handlers
+from pattern_io import config_to_patterns, load_pattern_file, with_track
+from pattern_table import (PatternTableModel, ModeDelegate, DurationDelegate, TrackDelegate,
+                           format_seconds,
+                           RowKeyTarget, LISTEN_PROMPT, KEY_COLUMN, MODE_COLUMN, HOLD_COLUMN,
+                           WAIT_COLUMN, TRACK_COLUMN, MAX_TRACKS)
+from key_engine import (ConstantHold, EventScheduler, PatternRunner, SchedulerWatchdog,
+                        compile_tracks, TIMING_HIGH_PRECISION, TIMING_LOW_CPU)
+from macro_recorder import MacroRecorder
+from save_store import CONSTANT, PATTERN, SaveStore
+
+class JobSignals(QObject):
+    """Carries job start and completion from the scheduler thread to the GUI thread"""
+    job_started = pyqtSignal(object)  # job
+    job_finished = pyqtSignal(object, bool)  # job, completed
+
+    def notify_started(self, job):
+        self.job_started.emit(job)
+
+    def notify(self, job, completed):
+        # Emitted on the scheduler thread; queued to receivers on the GUI thread
+        self.job_finished.emit(job, completed)
+
+class HotkeySignals(QObject):
+    """Carries hotkey commands and captured keys from input threads to the GUI thread"""
+    triggered = pyqtSignal(object, object)  # command, perf_counter_ns of the press
+    key_captured = pyqtSignal(str)  # Key name (or combination) seen while listening
+
+class TimeInputGroup(QGroupBox):
+    def __init__(self, title, parent=None):
+        super().__init__(title, parent)
+        layout = QHBoxLayout(self)
+        
+        # Create spin boxes with better precision and range
+        self.value_spin = QDoubleSpinBox()
+        self.value_spin.setRange(0.0, 9999.0)  # Allow up to 9999 seconds
+        self.value_spin.setSingleStep(0.1)
+        self.value_spin.setDecimals(1)
+        self.value_spin.setValue(1.0)
+        
+        layout.addWidget(self.value_spin)
+        layout.addWidget(QLabel("seconds"))
+
+class RandomRangeGroup(QGroupBox):
+    def __init__(self, title, parent=None):
+        super().__init__(title, parent)
+        layout = QVBoxLayout(self)
+
+        # Hold duration range
+        hold_layout = QHBoxLayout()
+        hold_layout.addWidget(QLabel("Hold Range:"))
+        self.min_hold = QDoubleSpinBox()
+        self.max_hold = QDoubleSpinBox()
+        for spin in (self.min_hold, self.max_hold):
+            spin.setRange(0.1, 9999.0)  # Hold time up to 9999 seconds
+            spin.setSingleStep(0.1)
+            spin.setDecimals(1)
+        self.min_hold.setValue(0.5)
+        self.max_hold.setValue(2.0)
+        hold_layout.addWidget(self.min_hold)
+        hold_layout.addWidget(QLabel("-"))
+        hold_layout.addWidget(self.max_hold)
+        hold_layout.addWidget(QLabel("seconds"))
+        layout.addLayout(hold_layout)
+
+        # Wait duration range
+        wait_layout = QHBoxLayout()
+        wait_layout.addWidget(QLabel("Wait Range:"))
+        self.min_wait = QDoubleSpinBox()
+        self.max_wait = QDoubleSpinBox()
+        for spin in (self.min_wait, self.max_wait):
+            spin.setRange(0.0, 9999.0)  # Allow up to 9999 seconds wait time
+            spin.setSingleStep(0.1)
+            spin.setDecimals(1)
+        self.min_wait.setValue(0.0)  # Default to 0 for minimum wait
+        self.max_wait.setValue(2.0)
+        wait_layout.addWidget(self.min_wait)
+        wait_layout.addWidget(QLabel("-"))
+        wait_layout.addWidget(self.max_wait)
+        wait_layout.addWidget(QLabel("seconds"))
+        layout.addLayout(wait_layout)
+
+class SaveTableModel(QAbstractTableModel):
+    """Sortable table of SaveEntry metadata for the Load dialog"""
+    PATTERN_HEADERS = ("Name", "Steps", "Tracks", "Duration", "Hotkey", "Modified")
+    CONSTANT_HEADERS = ("Name", "Key", "Hotkey", "Modified")
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.entries = []
+        self.headers = self.CONSTANT_HEADERS
+
+    def set_entries(self, entries, config_type):
+        self.beginResetModel()
+        self.entries = list(entries)
+        self.headers = self.CONSTANT_HEADERS if config_type == CONSTANT else self.PATTERN_HEADERS
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.entries)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.headers[section]
+        return None
+
+    def sort_value(self, entry, column):
+        header = self.headers[column]
+        if header == "Name":
+            return entry.name.lower()
+        if header == "Modified":
+            return entry.mtime_ns
+        if header == "Duration":
+            return entry.duration
+        if header == "Steps":
+            return entry.steps
+        if header == "Tracks":
+            return entry.tracks
+        if header == "Key":
+            return entry.key or ""
+        return entry.hotkey or ""
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        entry = self.entries[index.row()]
+        header = self.headers[index.column()]
+        if role == Qt.ItemDataRole.ToolTipRole and entry.error:
+            return f"Could not read this save: {entry.error}"
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if header == "Name":
+            return entry.name
+        if header == "Modified":
+            return time.strftime("%Y-%m-%d %H:%M", time.localtime(entry.mtime_ns / 1e9))
+        if entry.error:
+            return "?"
+        if header == "Duration":
+            low, high = entry.duration
+            if low == high:
+                return f"{format_seconds(low)} s"
+            return f"{format_seconds(low)} - {format_seconds(high)} s"
+        return str(self.sort_value(entry, index.column()))
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        self.layoutAboutToBeChanged.emit()
+        self.entries.sort(key=lambda entry: self.sort_value(entry, column),
+                          reverse=order == Qt.SortOrder.DescendingOrder)
+        self.layoutChanged.emit()
+
+
+class SaveManagerDialog(QDialog):
+    """Dialog for loading and deleting saved configurations.
+
+    Rows come from the save store's index, so only saves that changed since
+    the last refresh are read when the dialog opens.
+    """
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.setWindowTitle("Load Configuration")
+        self.setModal(True)
+        self.resize(560, 400)
+        self.selection = None
+        layout = QVBoxLayout(self)
+
+        # Add configuration type selector
+        type_group = QGroupBox("Configuration Type")
+        type_layout = QHBoxLayout()
+        
+        self.constant_radio = QRadioButton("Constant Key")
+        self.pattern_radio = QRadioButton("Pattern")
+        self.constant_radio.setChecked(True)
+            
+        type_layout.addWidget(self.constant_radio)
+        type_layout.addWidget(self.pattern_radio)
+        type_group.setLayout(type_layout)
+        layout.addWidget(type_group)
+        
+        self.model = SaveTableModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.verticalHeader().hide()
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.table.setSortingEnabled(True)
+        self.table.sortByColumn(0, Qt.SortOrder.AscendingOrder)
+        layout.addWidget(self.table)
+
+        # Button layout
+        button_layout = QHBoxLayout()
+        self.load_btn = QPushButton("Load")
+        self.load_btn.setEnabled(False)  # Initially disabled
+        self.delete_btn = QPushButton("Delete")
+        self.delete_btn.setEnabled(False)  # Initially disabled
+        close_btn = QPushButton("Close")
+        
+        button_layout.addWidget(self.load_btn)
+        button_layout.addWidget(self.delete_btn)
+        button_layout.addWidget(close_btn)
+        layout.addLayout(button_layout)
+
+        # Switching type only filters the index, nothing is read from disk
+        self.constant_radio.toggled.connect(lambda checked: checked and self.update_list())
+        self.pattern_radio.toggled.connect(lambda checked: checked and self.update_list())
+        self.load_btn.clicked.connect(self.load_selected)
+        self.delete_btn.clicked.connect(self.delete_selected)
+        close_btn.clicked.connect(self.reject)
+        
+        # Double click to load
+        self.table.doubleClicked.connect(lambda index: self.load_selected())
+
+    def config_type(self):
+        return CONSTANT if self.constant_radio.isChecked() else PATTERN
+
+    def choose(self, config_type="both"):
+        """Show the dialog. Returns (name, config_type) to load, or None."""
+        self.selection = None
+        try:
+            self.store.refresh()
+        except Exception as e:
+            QMessageBox.warning(self, "Warning", 
+                             f"Failed to list configurations: {str(e)}")
+        radio = self.pattern_radio if config_type == PATTERN else self.constant_radio
+        if radio.isChecked():
+            self.update_list()
+        else:
+            radio.setChecked(True)  # Refreshes the list through toggled
+        self.exec()
+        return self.selection
+
+    def update_buttons(self):
+        has_items = self.model.rowCount() > 0
+        self.load_btn.setEnabled(has_items)
+        self.delete_btn.setEnabled(has_items)
+
+    def update_list(self):
+        self.model.set_entries(self.store.entries(self.config_type()), self.config_type())
+        header = self.table.horizontalHeader()
+        self.model.sort(header.sortIndicatorSection(), header.sortIndicatorOrder())
+        self.update_buttons()
+
+    def current_name(self):
+        index = self.table.currentIndex()
+        return self.model.entries[index.row()].name if index.isValid() else None
+
+    def delete_selected(self):
+        name = self.current_name()
+        if name is None:
+            return
+            
+        reply = QMessageBox.question(self, "Confirm Delete",
+                                  f"Are you sure you want to delete '{name}'?",
+                                  QMessageBox.StandardButton.Yes | 
+                                  QMessageBox.StandardButton.No)
+                                  
+        if reply == QMessageBox.StandardButton.Yes:
+            config_type = self.config_type()
+            try:
+                self.store.delete(config_type, name)
+                self.update_list()
+                QMessageBox.information(self, "Success", 
+                                    f"{config_type.title()} configuration '{name}' deleted successfully")
+            except FileNotFoundError:
+                self.update_list()
+                QMessageBox.warning(self, "Warning", 
+                                 f"Configuration file '{name}.json' not found")
+            except Exception as e:
+                QMessageBox.critical(self, "Error", 
+                                  f"Failed to delete configuration: {str(e)}")
+
+    def load_selected(self):
+        name = self.current_name()
+        if name is None:
+            return
+        self.selection = (name, self.config_type())
+        self.accept()
+
+class AutoKeyHolder(QMainWindow):
+    def __init__(self, backend=None):
+        super().__init__()
+        self.setWindowTitle("Auto Key Holder")
+        self._backend = backend  # Created on first use, see the backend property
+        self._scheduler = None  # Plays every job, started on first use
+        self._watchdog = None  # Releases held keys if the scheduler gets stuck
+        self.job_signals = JobSignals(self)
+        self.job_signals.job_started.connect(self.on_job_started)
+        self.job_signals.job_finished.connect(self.on_job_finished)
+        self.hotkey_signals = HotkeySignals(self)
+        self.hotkey_signals.triggered.connect(self.on_hotkey)
+        self.hotkey_signals.key_captured.connect(self.on_key_captured)
+        self._hotkey_dispatcher = None  # Started with the first hotkey
+        self._hotkey_pressed_ns = None  # Press being handled by on_hotkey()
+        self._hotkey_registry = None  # Registered hotkeys, see setup_global_hotkeys()
+        self._listen_handle = None  # Key hook while capturing a key
+        self.hotkey_table = HotkeyTable()  # Every bound hotkey, see setup_global_hotkeys()
+        self.saved_jobs = {}  # (config type, name) -> job started by a saved hotkey
+        self._save_dialog = None  # Built the first time Load is clicked
+        self._save_store = None  # Index of saved configurations, read on first use
+        self._random_range = None  # Random duration editor, built when first shown
+        self.patterns = []
+        self.random_ranges = {}
+        self.constant_key = None
+        self.constant_key_job = None
+        self.is_constant_key_active = False
+        self.is_listening = False
+        self.current_input_target = None
+        self.is_hotkey = False  # Flag to indicate if we're listening for a hotkey
+        self.constant_hotkey = None  # Store constant key hotkey
+        self.pattern_hotkey = None   # Store pattern hotkey
+        self.pattern_job = None   # Running pattern, a PatternRunner
+        self.recorder = None  # MacroRecorder while recording
+        self.is_pattern_active = False  # Flag for pattern state
+        self.initUI()
+        # No hotkeys are configured yet, so the keyboard hook is not installed
+        # until a hotkey is set or a key is captured
+
+    @property
+    def backend(self):
+        """Input backend; importing it (and `keyboard`) waits until it is needed"""
+        if self._backend is None:
+            self._backend = get_backend()
+            # Keys the app holds are released even if it is closed or killed mid-pattern;
+            # a termination signal quits the event loop (see wake_on_signals())
+            install_release_handlers(self._backend, lambda signum: QApplication.quit())
+        return self._backend
+
+    @property
+    def save_store(self):
+        if self._save_store is None:
+            self._save_store = SaveStore()
+        return self._save_store
+
+    @property
+    def scheduler(self):
+        """Single thread that plays the constant hold and patterns"""
+        if self._scheduler is None:
+            self._scheduler = EventScheduler(self.backend).start()
+            self._watchdog = SchedulerWatchdog(self._scheduler).start()
+        return self._scheduler
+
+    @property
+    def hotkey_dispatcher(self):
+        """Runs hotkey commands so the input hook only has to queue them"""
+        if self._hotkey_dispatcher is None:
+            self._hotkey_dispatcher = HotkeyDispatcher(self.hotkey_signals.triggered.emit).start()
+        return self._hotkey_dispatcher
+
+    def submit_job(self, job):
+        job.on_start = self.job_signals.notify_started
+        job.on_done = self.job_signals.notify
+        job.requested_ns = self._hotkey_pressed_ns
+        return self.scheduler.submit(job)
+
+    def on_hotkey(self, command, pressed_ns):
+        self._hotkey_pressed_ns = pressed_ns
+        try:
+            if command == CONSTANT:
+                self.toggle_constant_key()
+            elif command == PATTERN:
+                self.toggle_pattern()
+            else:
+                self.toggle_saved(*command)
+        finally:
+            self._hotkey_pressed_ns = None
+
+    def on_job_started(self, job):
+        if job.requested_ns is None:
+            return
+        dispatcher = self.hotkey_dispatcher
+        latency_ns = dispatcher.record_start(job.requested_ns, job.anchor_ns)
+        stats = dispatcher.stats()
+        self.latency_label.setText(f"Hotkey to start: {latency_ns / 1e6:.2f} ms "
+                                   f"(max {stats['max_press_to_start_ms']:.2f} ms, "
+                                   f"hook {stats['max_hook_callback_us']:.0f} µs)")
+
+    def is_job_running(self, job):
+        return job is not None and not job.done
+
+    @property
+    def random_range(self):
+        """Random duration editor of the Add New Pattern group"""
+        if self._random_range is None:
+            self._random_range = RandomRangeGroup("Random Durations")
+            self.time_stack.addWidget(self._random_range)
+        return self._random_range
+
+    def show_random_page(self):
+        self.time_stack.setCurrentWidget(self.random_range)
+        
+    def start_listening(self, input_widget, is_hotkey=False):
+        if self.is_listening or self.is_recording:
+            return
+            
+        self.is_listening = True
+        self.is_hotkey = is_hotkey
+        self.current_input_target = input_widget
+        input_widget.setText(LISTEN_PROMPT)
+        self._listen_handle = self.backend.on_press(self.on_key_press)
+        
+    def on_key_press(self, event):
+        # Runs on the input hook thread: only read the key and queue it for
+        # on_key_captured(), so the system-wide hook is never held up
+        key_name = event.name
+        if self.is_hotkey:
+            # For hotkeys, capture every key held right now
+            pressed_keys = self.backend.get_hotkey_name()
+            if pressed_keys:
+                key_name = pressed_keys
+        self.hotkey_signals.key_captured.emit(key_name)
+
+    def on_key_captured(self, key_name):
+        if self.is_listening and self.current_input_target:
+            # Set the text and ensure it's centered
+            self.current_input_target.setText(key_name)
+            
+            # Update hotkeys if necessary
+            if self.is_hotkey:
+                # Check if the new hotkey is already in use
+                own = CONSTANT if self.current_input_target == self.constant_hotkey_input else PATTERN
+                owner = self.hotkey_table.find(key_name)
+                
+                if owner is not None and owner.command != own:
+                    QMessageBox.warning(self, "Warning", 
+                                     f"This hotkey is already used by {owner.label}. "
+                                     f"Please choose a different one.")
+                    self.current_input_target.clear()
+                else:
+                    # Apply the new hotkey
+                    if self.current_input_target == self.constant_hotkey_input:
+                        self.update_constant_hotkey(key_name)
+                    elif self.current_input_target == self.pattern_hotkey_input:
+                        self.update_pattern_hotkey(key_name)
+            else:
+                # If it's not a hotkey, make sure the text is centered
+                self.current_input_target.setAlignment(Qt.AlignmentFlag.AlignCenter)
+            
+            # Reset listening state; the hotkeys were never unhooked
+            self.backend.unhook(self._listen_handle)
+            self._listen_handle = None
+            self.is_listening = False
+            self.is_hotkey = False
+            self.current_input_target = None
+            
+    @property
+    def hotkey_registry(self):
+        if self._hotkey_registry is None:
+            self._hotkey_registry = HotkeyRegistry(
+                self.backend, self.hotkey_dispatcher.callback,
+                suppress=True,
+                trigger_on_release=False,  # Trigger immediately on press
+                timeout=0.1  # Reduce timeout for faster response
+            )
+        return self._hotkey_registry
+
+    def build_hotkey_table(self):
+        """Table of the window's hotkeys plus, if enabled, those of every save"""
+        table = HotkeyTable()
+        # The window's own hotkeys come first, so they win any clash
+        if self.constant_hotkey:
+            table.add(self.constant_hotkey, CONSTANT, "the constant key hotkey")
+        if self.pattern_hotkey:
+            table.add(self.pattern_hotkey, PATTERN, "the pattern hotkey")
+        if self.saved_hotkeys_check.isChecked():
+            self.save_store.refresh()
+            table.add_saves(self.save_store)
+        return table
+
+    def setup_global_hotkeys(self):
+        """Bring the registered hotkeys in line with the hotkey table.
+
+        Only hotkeys that changed are added or removed; the others stay live.
+        """
+        if self._hotkey_registry is None and not (self.constant_hotkey or self.pattern_hotkey
+                                                  or self.saved_hotkeys_check.isChecked()):
+            return  # Nothing to register and nothing hooked yet
+        self.hotkey_table = self.build_hotkey_table()
+        failed = self.hotkey_registry.set_bindings(self.hotkey_table.bindings())
+        failed_commands = {self.hotkey_table.find(hotkey).command: error
+                           for hotkey, error in failed.items()}
+
+        error = self.window_hotkey_error(CONSTANT, self.constant_hotkey, failed_commands)
+        if error:
+            print(f"Error setting up constant key hotkey: {error}")
+            self.constant_hotkey = None
+            self.constant_hotkey_input.clear()
+        elif self.constant_hotkey:
+            # Make sure the hotkey input shows the current hotkey
+            self.constant_hotkey_input.setText(self.constant_hotkey)
+        error = self.window_hotkey_error(PATTERN, self.pattern_hotkey, failed_commands)
+        if error:
+            print(f"Error setting up pattern hotkey: {error}")
+            self.pattern_hotkey = None
+            self.pattern_hotkey_input.clear()
+        elif self.pattern_hotkey:
+            self.pattern_hotkey_input.setText(self.pattern_hotkey)
+        self.update_saved_hotkeys_status(failed_commands)
+
+    def window_hotkey_error(self, command, hotkey, failed_commands):
+        """Why the window's hotkey for command is not bound to it, or None if it is"""
+        if not hotkey:
+            return None
+        if command in failed_commands:
+            return failed_commands[command]
+        binding = self.hotkey_table.find(hotkey)
+        if binding is None:
+            return "invalid hotkey"
+        if binding.command != command:
+            # Both window hotkeys are the same keys; the first one added keeps them
+            return f"{binding.hotkey} is already {binding.label}"
+        return None
+
+    def update_saved_hotkeys_status(self, failed_commands=()):
+        table = self.hotkey_table
+        saved = sum(1 for binding in table if isinstance(binding.command, tuple))
+        # A save sharing the window's hotkey is usually the loaded one; note it only
+        shadowed = [f"{rejected.label} ({rejected.hotkey}) is shadowed by {kept.label}"
+                    for kept, rejected in table.conflicts if kept.command in (CONSTANT, PATTERN)]
+        problems = [f"{rejected.label} ({rejected.hotkey}) clashes with {kept.label}"
+                    for kept, rejected in table.conflicts if kept.command not in (CONSTANT, PATTERN)]
+        problems += [f"{shorter.label} ({shorter.hotkey}) fires while pressing "
+                     f"{longer.label} ({longer.hotkey})"
+                     for shorter, longer in table.prefix_collisions()]
+        problems += [f"{label} has an invalid hotkey {hotkey!r}: {error}"
+                     for label, hotkey, error in table.invalid]
+        problems += [f"{command} could not be registered: {error}"
+                     for command, error in failed_commands.items()]
+        if not self.saved_hotkeys_check.isChecked():
+            self.saved_hotkeys_status.setText("")
+        else:
+            text = f"{saved} bound"
+            if problems:
+                text += f", {len(problems)} problem{'s' if len(problems) != 1 else ''}"
+            self.saved_hotkeys_status.setText(text)
+        self.saved_hotkeys_status.setToolTip("\n".join(problems + shadowed))
+        for problem in problems:
+            print(f"Hotkey problem: {problem}")
+
+    def toggle_saved(self, config_type, name):
+        """Start or stop the save bound to a hotkey, alongside whatever else runs"""
+        key = (config_type, name)
+        job = self.saved_jobs.pop(key, None)
+        if self.is_job_running(job):
+            job.cancel()
+            return
+        try:
+            if config_type == CONSTANT:
+                entry = self.save_store.get(CONSTANT, name)
+                if entry is None or not entry.key:
+                    raise ValueError("the save has no key")
+                job = ConstantHold(entry.key)
+            else:
+                patterns, _ = load_pattern_file(self.save_store.path(PATTERN, name))
+                job = PatternRunner(compile_tracks(patterns), self.backend, self.rep_input.value(),
+                                    self.timing_combo.currentData(), self.get_seed())
+        except Exception as e:
+            print(f"Failed to start {config_type} '{name}': {e}")
+            return
+        self.saved_jobs[key] = self.submit_job(job)
+
+    def update_constant_hotkey(self, hotkey):
+        """Update constant key hotkey without affecting pattern hotkey"""
+        self.constant_hotkey = hotkey
+        self.setup_global_hotkeys()
+
+    def update_pattern_hotkey(self, hotkey):
+        """Update pattern hotkey without affecting constant hotkey"""
+        self.pattern_hotkey = hotkey
+        self.setup_global_hotkeys()
+
+    def save_constant_key(self):
+        # Ask user for save name
+        name, ok = QInputDialog.getText(self, "Save Constant Key", 
+                                      "Enter a name for the constant key configuration:",
+                                      QLineEdit.EchoMode.Normal)
+        if ok and name:
+            if self.save_store.exists(CONSTANT, name):
+                reply = QMessageBox.question(self, "Confirm Overwrite",
+                                          f"Constant key configuration '{name}' already exists. Overwrite?",
+                                          QMessageBox.StandardButton.Yes | 
+                                          QMessageBox.StandardButton.No)
+                if reply == QMessageBox.StandardButton.No:
+                    return
+
+            try:
+                self.save_store.save_constant(name, self.constant_key_input.text(),
+                                              self.constant_hotkey)
+                if self.saved_hotkeys_check.isChecked():
+                    self.setup_global_hotkeys()
+                QMessageBox.information(self, "Success", 
+                                     f"Constant key configuration saved as '{name}'")
+            except Exception as e:
+                QMessageBox.critical(self, "Error", 
+                                   f"Failed to save constant key configuration: {str(e)}")
+
+    def save_pattern(self):
+        # Ask user for save name
+        name, ok = QInputDialog.getText(self, "Save Pattern", 
+                                      "Enter a name for the pattern configuration:",
+                                      QLineEdit.EchoMode.Normal)
+        if ok and name:
+            if self.save_store.exists(PATTERN, name):
+                reply = QMessageBox.question(self, "Confirm Overwrite",
+                                          f"Pattern configuration '{name}' already exists. Overwrite?",
+                                          QMessageBox.StandardButton.Yes | 
+                                          QMessageBox.StandardButton.No)
+                if reply == QMessageBox.StandardButton.No:
+                    return
+
+            try:
+                self.save_store.save_pattern(name, self.patterns, self.pattern_hotkey)
+                if self.saved_hotkeys_check.isChecked():
+                    self.setup_global_hotkeys()
+                QMessageBox.information(self, "Success", 
+                                     f"Pattern configuration saved as '{name}'")
+            except Exception as e:
+                QMessageBox.critical(self, "Error", 
+                                   f"Failed to save pattern configuration: {str(e)}")
+
+    def manage_saves(self, config_type="both"):
+        # The dialog is only built the first time it is needed, then reused
+        if self._save_dialog is None:
+            self._save_dialog = SaveManagerDialog(self.save_store, self)
+        selection = self._save_dialog.choose(config_type)
+        if selection:
+            self._load_configuration(*selection)
+        elif self.saved_hotkeys_check.isChecked():
+            self.setup_global_hotkeys()  # Saves may have been deleted
+        
+    def _load_configuration(self, name, config_type):
+        filepath = self.save_store.path(config_type, name)
+        try:
+            with open(filepath, 'r') as f:
+                config = json.load(f)
+            
+            if config_type == CONSTANT:
+                # Load constant key settings
+                if isinstance(config, dict):  # Direct constant key config
+                    self.constant_key_input.setText(config["key"])
+                    self.constant_hotkey = config.get("hotkey")
+                else:
+                    raise ValueError("Invalid constant key configuration format")
+                    
+                # Update hotkeys
+                self.setup_global_hotkeys()
+                
+                QMessageBox.information(self, "Success", 
+                                     f"Constant key configuration '{name}' loaded successfully")
+                                     
+            else:  # Pattern configuration
+                if not isinstance(config, dict):
+                    raise ValueError("Invalid pattern configuration format")
+                # Parse and validate every step before touching the current
+                # list, then swap the whole list into the model at once
+                patterns = config_to_patterns(config)
+                self.random_ranges.clear()
+                self.pattern_model.set_patterns(patterns)
+                
+                # Load pattern hotkey
+                if "pattern_hotkey" in config:
+                    self.pattern_hotkey = config["pattern_hotkey"]
+                    if self.pattern_hotkey:
+                        self.pattern_hotkey_input.setText(self.pattern_hotkey)
+                    
+                # Update hotkeys
+                self.setup_global_hotkeys()
+                
+                QMessageBox.information(self, "Success", 
+                                     f"Pattern configuration '{name}' loaded successfully")
+                
+        except Exception as e:
+            QMessageBox.critical(self, "Error", 
+                               f"Failed to load configuration: {str(e)}")
+
+    def load_configuration(self, config_type="both"):
+        self.manage_saves(config_type)
+        
+    def load_constant_key(self):
+        self.load_configuration("constant")
+        
+    def load_pattern(self):
+        self.load_configuration("pattern")
+        
+    def toggle_pattern(self):
+        if self.is_pattern_active:
+            self.stop_pattern()
+        else:
+            self.start_pattern()
+
+    def initUI(self):
+        self.setGeometry(300, 150, 600, 700)
+
+        central_widget = QWidget()
+        self.setCentralWidget(central_widget)
+        layout = QVBoxLayout(central_widget)
+
+        # Title
+        title_label = QLabel("Auto Key Holder")
+        title_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        title_font = QFont()
+        title_font.setPointSize(14)
+        title_font.setBold(True)
+        title_label.setFont(title_font)
+        layout.addWidget(title_label)
+
+        # Constant key section
+        constant_key_group = QGroupBox("Constant Key Control")
+        constant_key_layout = QVBoxLayout(constant_key_group)
+        
+        # Constant key input row
+        key_input_layout = QHBoxLayout()
+        key_input_layout.addWidget(QLabel("Key:"))
+        self.constant_key_input = QLineEdit()
+        self.constant_key_input.setPlaceholderText("Press Listen to capture key")
+        self.constant_key_input.setReadOnly(True)
+        self.constant_key_input.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        key_input_layout.addWidget(self.constant_key_input)
+        
+        # Listen button for constant key
+        self.constant_listen_btn = QPushButton("Listen")
+        self.constant_listen_btn.clicked.connect(lambda: self.start_listening(self.constant_key_input))
+        key_input_layout.addWidget(self.constant_listen_btn)
+        constant_key_layout.addLayout(key_input_layout)
+        
+        # Hotkey input for constant key
+        hotkey_layout = QHBoxLayout()
+        hotkey_layout.addWidget(QLabel("Hotkey:"))
+        self.constant_hotkey_input = QLineEdit()
+        self.constant_hotkey_input.setPlaceholderText("Press Listen to set hotkey")
+        self.constant_hotkey_input.setReadOnly(True)
+        self.constant_hotkey_input.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        hotkey_layout.addWidget(self.constant_hotkey_input)
+        
+        # Listen button for hotkey
+        self.constant_hotkey_listen = QPushButton("Listen")
+        self.constant_hotkey_listen.clicked.connect(lambda: self.start_listening(self.constant_hotkey_input, True))
+        hotkey_layout.addWidget(self.constant_hotkey_listen)
+        constant_key_layout.addLayout(hotkey_layout)
+        
+        # Constant key control buttons
+        constant_key_buttons = QHBoxLayout()
+        self.constant_key_start = QPushButton("Start Holding")
+        self.constant_key_start.clicked.connect(self.toggle_constant_key)
+        constant_key_buttons.addWidget(self.constant_key_start)
+        constant_key_layout.addLayout(constant_key_buttons)
+        
+        # Save/Load buttons for constant key
+        save_load_layout = QHBoxLayout()
+        save_button = QPushButton("Save Constant Key")
+        save_button.clicked.connect(self.save_constant_key)
+        load_button = QPushButton("Load Constant Key")
+        load_button.clicked.connect(self.load_constant_key)
+        save_load_layout.addWidget(save_button)
+        save_load_layout.addWidget(load_button)
+        constant_key_layout.addLayout(save_load_layout)
+        
+        layout.addWidget(constant_key_group)
+
+        # Pattern input section
+        input_group = QGroupBox("Add New Pattern")
+        input_layout = QVBoxLayout(input_group)
+
+        # Key input for patterns
+        key_layout = QHBoxLayout()
+        key_layout.addWidget(QLabel("Pattern Key:"))
+        self.key_input = QLineEdit()
+        self.key_input.setPlaceholderText("Press Listen to capture key")
+        self.key_input.setReadOnly(True)
+        self.key_input.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.key_input.setMinimumWidth(100)
+        key_layout.addWidget(self.key_input)
+        
+        # Listen button for pattern key
+        self.pattern_listen_btn = QPushButton("Listen")
+        self.pattern_listen_btn.clicked.connect(lambda: self.start_listening(self.key_input))
+        key_layout.addWidget(self.pattern_listen_btn)
+
+        # Steps on different tracks play at the same time
+        key_layout.addWidget(QLabel("Track:"))
+        self.track_input = QSpinBox()
+        self.track_input.setRange(1, MAX_TRACKS)
+        self.track_input.setToolTip("Steps on different tracks run concurrently, "
+                                    "e.g. hold Shift on track 2 while track 1 taps W")
+        key_layout.addWidget(self.track_input)
+        input_layout.addLayout(key_layout)
+
+        # Time inputs stacked widget
+        self.time_stack = QStackedWidget()
+        
+        # Custom duration page
+        custom_page = QWidget()
+        custom_layout = QHBoxLayout(custom_page)
+        self.hold_input = TimeInputGroup("Hold Duration")
+        self.wait_input = TimeInputGroup("Wait Duration")
+        custom_layout.addWidget(self.hold_input)
+        custom_layout.addWidget(self.wait_input)
+        self.time_stack.addWidget(custom_page)
+
+        # The random duration page is added on first use (see random_range)
+        
+        input_layout.addWidget(self.time_stack)
+
+        # Duration mode selection
+        mode_layout = QHBoxLayout()
+        self.duration_group = QButtonGroup()
+        self.custom_radio = QRadioButton("Custom Durations")
+        self.random_radio = QRadioButton("Random Durations")
+        self.custom_radio.setChecked(True)
+        
+        self.duration_group.addButton(self.custom_radio)
+        self.duration_group.addButton(self.random_radio)
+        
+        mode_layout.addWidget(self.custom_radio)
+        mode_layout.addWidget(self.random_radio)
+        input_layout.addLayout(mode_layout)
+
+        # Connect radio buttons to stack widget
+        self.custom_radio.toggled.connect(lambda: self.time_stack.setCurrentIndex(0))
+        self.random_radio.toggled.connect(lambda checked: checked and self.show_random_page())
+
+        # Add pattern button
+        add_button = QPushButton("Add Pattern")
+        add_button.clicked.connect(self.add_pattern)
+        input_layout.addWidget(add_button)
+
+        layout.addWidget(input_group)
+
+        # Pattern list group
+        list_group = QGroupBox("Patterns")
+        list_layout = QVBoxLayout(list_group)
+        
+        # Table of patterns; only visible rows are painted and editors are
+        # created just for the cell being edited
+        self.pattern_model = PatternTableModel(self.patterns, self)
+        self.pattern_table = QTableView()
+        self.pattern_table.setModel(self.pattern_model)
+        self.pattern_table.setMinimumHeight(200)
+        self.pattern_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.pattern_table.setEditTriggers(QAbstractItemView.EditTrigger.DoubleClicked |
+                                           QAbstractItemView.EditTrigger.EditKeyPressed)
+        self.pattern_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.pattern_table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.pattern_table.setItemDelegateForColumn(MODE_COLUMN, ModeDelegate(self.pattern_table))
+        self.pattern_table.setItemDelegateForColumn(HOLD_COLUMN, DurationDelegate(0.1, self.pattern_table))
+        self.pattern_table.setItemDelegateForColumn(WAIT_COLUMN, DurationDelegate(0.0, self.pattern_table))
+        self.pattern_table.setItemDelegateForColumn(TRACK_COLUMN, TrackDelegate(self.pattern_table))
+        self.pattern_table.doubleClicked.connect(self.on_pattern_cell_double_clicked)
+        list_layout.addWidget(self.pattern_table)
+
+        # Row actions
+        row_buttons = QHBoxLayout()
+        listen_button = QPushButton("Listen")
+        listen_button.setToolTip("Capture a new key for the selected pattern")
+        listen_button.clicked.connect(self.listen_selected_pattern)
+        row_buttons.addWidget(listen_button)
+        remove_button = QPushButton("Remove Selected")
+        remove_button.clicked.connect(self.remove_selected_patterns)
+        row_buttons.addWidget(remove_button)
+
+        # Clear All button
+        clear_all_button = QPushButton("Clear All Patterns")
+        clear_all_button.clicked.connect(self.clear_all_patterns)
+        row_buttons.addWidget(clear_all_button)
+        list_layout.addLayout(row_buttons)
+
+        # Macro recording: captured keys replace the pattern list when stopped
+        record_layout = QHBoxLayout()
+        self.record_button = QPushButton("Record")
+        self.record_button.setToolTip("Record key presses as patterns; overlapping keys "
+                                      "are put on separate tracks")
+        self.record_button.clicked.connect(self.toggle_recording)
+        record_layout.addWidget(self.record_button)
+        record_layout.addWidget(QLabel("Quantize:"))
+        self.quantize_input = QDoubleSpinBox()
+        self.quantize_input.setRange(0.0, 10.0)
+        self.quantize_input.setSingleStep(0.01)
+        self.quantize_input.setDecimals(3)
+        self.quantize_input.setSuffix(" s")
+        self.quantize_input.setSpecialValueText("Off")
+        self.quantize_input.setToolTip("Snap recorded presses and releases to this grid")
+        record_layout.addWidget(self.quantize_input)
+        record_layout.addWidget(QLabel("Merge gap:"))
+        self.merge_gap_input = QDoubleSpinBox()
+        self.merge_gap_input.setRange(0.0, 10.0)
+        self.merge_gap_input.setSingleStep(0.01)
+        self.merge_gap_input.setDecimals(3)
+        self.merge_gap_input.setSuffix(" s")
+        self.merge_gap_input.setSpecialValueText("Off")
+        self.merge_gap_input.setToolTip("Join presses of the same key closer together than this")
+        record_layout.addWidget(self.merge_gap_input)
+        list_layout.addLayout(record_layout)
+        
+        layout.addWidget(list_group)
+
+        # Control section
+        control_group = QGroupBox("Execution Controls")
+        control_layout = QVBoxLayout(control_group)
+        
+        # Hotkey input for pattern control
+        pattern_hotkey_layout = QHBoxLayout()
+        pattern_hotkey_layout.addWidget(QLabel("Pattern Hotkey:"))
+        self.pattern_hotkey_input = QLineEdit()
+        self.pattern_hotkey_input.setPlaceholderText("Press Listen to set hotkey")
+        self.pattern_hotkey_input.setReadOnly(True)
+        self.pattern_hotkey_input.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        pattern_hotkey_layout.addWidget(self.pattern_hotkey_input)
+        
+        # Listen button for pattern hotkey
+        self.pattern_hotkey_listen = QPushButton("Listen")
+        self.pattern_hotkey_listen.clicked.connect(lambda: self.start_listening(self.pattern_hotkey_input, True))
+        pattern_hotkey_layout.addWidget(self.pattern_hotkey_listen)
+        control_layout.addLayout(pattern_hotkey_layout)
+
+        # Repetitions input
+        rep_layout = QHBoxLayout()
+        rep_layout.addWidget(QLabel("Repetitions:"))
+        self.rep_input = QSpinBox()
+        self.rep_input.setRange(-1, 999999)
+        self.rep_input.setValue(-1)  # Set to infinite by default
+        self.rep_input.setSpecialValueText("∞")  # Show infinity symbol for -1
+        rep_layout.addWidget(self.rep_input)
+        control_layout.addLayout(rep_layout)
+
+        # Timing mode selection
+        timing_layout = QHBoxLayout()
+        timing_layout.addWidget(QLabel("Timing:"))
+        self.timing_combo = QComboBox()
+        self.timing_combo.addItem("High Precision", TIMING_HIGH_PRECISION)
+        self.timing_combo.addItem("Low CPU", TIMING_LOW_CPU)
+        self.timing_combo.setToolTip("High Precision spins for the last moment before each "
+                                     "deadline (sub-millisecond jitter). Low CPU only sleeps.")
+        timing_layout.addWidget(self.timing_combo)
+        control_layout.addLayout(timing_layout)
+
+        # Seed for random durations, so a run can be replayed exactly
+        seed_layout = QHBoxLayout()
+        seed_layout.addWidget(QLabel("Seed:"))
+        self.seed_input = QLineEdit()
+        self.seed_input.setPlaceholderText("Random")
+        self.seed_input.setToolTip("Enter a number to replay the same random durations")
+        seed_layout.addWidget(self.seed_input)
+        control_layout.addLayout(seed_layout)
+
+        # Start/Stop buttons
+        button_layout = QHBoxLayout()
+        self.start_button = QPushButton("Start")
+        self.start_button.clicked.connect(self.start_pattern)
+        button_layout.addWidget(self.start_button)
+        
+        self.stop_button = QPushButton("Stop")
+        self.stop_button.clicked.connect(self.stop_pattern)
+        self.stop_button.setEnabled(False)
+        button_layout.addWidget(self.stop_button)
+        
+        control_layout.addLayout(button_layout)
+
+        # Add save/load configuration buttons
+        save_load_layout = QHBoxLayout()
+        save_button = QPushButton("Save Pattern")
+        save_button.clicked.connect(self.save_pattern)
+        load_button = QPushButton("Load Pattern")
+        load_button.clicked.connect(self.load_pattern)
+        save_load_layout.addWidget(save_button)
+        save_load_layout.addWidget(load_button)
+        control_layout.addLayout(save_load_layout)
+
+        # Hotkeys stored in saves start and stop those saves directly
+        saved_hotkeys_layout = QHBoxLayout()
+        self.saved_hotkeys_check = QCheckBox("Enable hotkeys of all saves")
+        self.saved_hotkeys_check.setToolTip("Each saved constant key or pattern with a hotkey can be "
+                                            "started and stopped with it, using the repetitions and "
+                                            "timing set here")
+        self.saved_hotkeys_check.toggled.connect(self.setup_global_hotkeys)
+        saved_hotkeys_layout.addWidget(self.saved_hotkeys_check)
+        self.saved_hotkeys_status = QLabel("")
+        saved_hotkeys_layout.addWidget(self.saved_hotkeys_status)
+        control_layout.addLayout(saved_hotkeys_layout)
+
+        # Measured from the hotkey press reaching the hook to the job starting
+        self.latency_label = QLabel("Hotkey to start: –")
+        self.latency_label.setToolTip("Time from a hotkey press to its hold or pattern starting, "
+                                      "and the longest time spent in the keyboard hook")
+        control_layout.addWidget(self.latency_label)
+
+        layout.addWidget(control_group)
+
+        # Keep the Start button in step with the pattern list
+        self.pattern_model.rowsInserted.connect(self.update_start_button)
+        self.pattern_model.rowsRemoved.connect(self.update_start_button)
+        self.pattern_model.modelReset.connect(self.update_start_button)
+
+        # Edits made while a pattern runs are applied live. A burst of changes
+        # (dragging a spin box, removing many rows) is coalesced into one plan.
+        self._plan_publish_timer = QTimer(self)
+        self._plan_publish_timer.setSingleShot(True)
+        self._plan_publish_timer.setInterval(50)
+        self._plan_publish_timer.timeout.connect(self.publish_running_plan)
+        for signal in (self.pattern_model.dataChanged, self.pattern_model.rowsInserted,
+                       self.pattern_model.rowsRemoved, self.pattern_model.modelReset):
+            signal.connect(self.schedule_plan_publish)
+
+    def add_pattern(self):
+        key = self.key_input.text().strip()
+        if not key:
+            return
+
+        if self.random_radio.isChecked():
+            # Store random ranges for this key
+            self.random_ranges[key] = (
+                self.random_range.min_hold.value(),
+                self.random_range.max_hold.value(),
+                self.random_range.min_wait.value(),
+                self.random_range.max_wait.value()
+            )
+            pattern = with_track(key,
+                                 f"{self.random_range.min_hold.value()}-{self.random_range.max_hold.value()}",
+                                 f"{self.random_range.min_wait.value()}-{self.random_range.max_wait.value()}",
+                                 self.track_input.value())
+        else:
+            hold_duration = self.hold_input.value_spin.value()
+            wait_duration = self.wait_input.value_spin.value()
+            pattern = with_track(key, str(hold_duration), str(wait_duration),
+                                 self.track_input.value())
+
+        self.pattern_model.append_pattern(pattern)
+        self.key_input.clear()
+
+    def selected_rows(self):
+        return sorted({index.row() for index in self.pattern_table.selectionModel().selectedRows()})
+
+    def remove_selected_patterns(self):
+        # Group the selection into contiguous runs, one model removal per run
+        runs = []
+        for row in self.selected_rows():
+            if runs and row == runs[-1][0] + runs[-1][1]:
+                runs[-1][1] += 1
+            else:
+                runs.append([row, 1])
+
+        # Remove from the bottom up so earlier runs keep their positions
+        for row, count in reversed(runs):
+            for removed_pattern in self.pattern_model.remove_rows(row, count):
+                # Clean up random ranges if necessary
+                self.random_ranges.pop(removed_pattern[0], None)
+
+    def listen_selected_pattern(self):
+        rows = self.selected_rows()
+        if rows:
+            self.start_listening(RowKeyTarget(self.pattern_model, rows[0]))
+
+    def on_pattern_cell_double_clicked(self, index):
+        # Keys are captured rather than typed, other columns open their editors
+        if index.column() == KEY_COLUMN:
+            self.start_listening(RowKeyTarget(self.pattern_model, index.row()))
+
+    def update_start_button(self):
+        self.start_button.setEnabled(len(self.patterns) > 0)
+        
+    @property
+    def is_recording(self):
+        return self.recorder is not None and self.recorder.recording
+
+    def toggle_recording(self):
+        if self.is_recording:
+            self.finish_recording()
+            return
+        if self.is_listening or self.is_job_running(self.pattern_job):
+            return  # Don't record the pattern's own key presses
+        self.recorder = MacroRecorder(self.backend).start()
+        self.record_button.setText("Stop Recording")
+
+    def finish_recording(self):
+        self.recorder.stop()
+        self.record_button.setText("Record")
+        patterns = self.recorder.to_patterns(self.quantize_input.value(),
+                                             self.merge_gap_input.value())
+        if self.recorder.dropped:
+            QMessageBox.warning(self, "Warning", f"The recording was too long; the first "
+                                                 f"{self.recorder.dropped} key events were dropped.")
+        if not patterns:
+            return
+        if self.patterns:
+            reply = QMessageBox.question(self, "Replace Patterns",
+                                         f"Replace the pattern list with the {len(patterns)} "
+                                         f"recorded steps?")
+            if reply != QMessageBox.StandardButton.Yes:
+                return
+        self.random_ranges.clear()
+        self.pattern_model.set_patterns(patterns)
+
+    def clear_all_patterns(self):
+        # Clear all patterns and random ranges
+        self.pattern_model.clear()
+        self.random_ranges.clear()
+
+    def toggle_constant_key(self):
+        if self.is_job_running(self.constant_key_job) and not self.is_constant_key_active:
+            return  # Still being released
+        if not self.is_constant_key_active:
+            # Start holding
+            key = self.constant_key_input.text().strip()
+            if not key:
+                return
+                
+            self.constant_key_job = self.submit_job(ConstantHold(key))
+            self.is_constant_key_active = True
+            self.constant_key_start.setText("Stop Holding")
+            self.constant_key_input.setEnabled(False)
+            self.constant_listen_btn.setEnabled(False)
+        else:
+            # Stop holding: returns at once, on_job_finished() resets the
+            # controls once the scheduler has released the key
+            self.is_constant_key_active = False
+            if self.is_job_running(self.constant_key_job):
+                self.constant_key_start.setEnabled(False)
+                self.constant_key_job.cancel()
+            else:
+                self.on_constant_key_released()
+
+    def on_constant_key_released(self):
+        self.constant_key_job = None
+        self.constant_key_start.setText("Start Holding")
+        self.constant_key_start.setEnabled(True)
+        self.constant_key_input.setEnabled(True)
+        self.constant_listen_btn.setEnabled(True)
+
+    def start_pattern(self):
+        if not self.patterns:
+            return
+            
+        if self.is_job_running(self.pattern_job):
+            return
+
+        # Parse every step once up front; the scheduler only reads the plans.
+        # Tracks play concurrently, on the scheduler thread like everything else.
+        self.pattern_job = self.submit_job(PatternRunner(
+            compile_tracks(self.patterns),
+            self.backend,
+            self.rep_input.value(),
+            self.timing_combo.currentData(),
+            self.get_seed()
+        ))
+        # Show the seed that was used so the run can be replayed
+        self.seed_input.setPlaceholderText(f"Random (last: {self.pattern_job.seed})")
+
+        self.is_pattern_active = True
+        self.start_button.setEnabled(False)
+        self.stop_button.setEnabled(True)
+
+    def schedule_plan_publish(self, *args):
+        if self.is_job_running(self.pattern_job):
+            self._plan_publish_timer.start()
+
+    def publish_running_plan(self):
+        # Applied to the running pattern at its next step
+        if self.is_job_running(self.pattern_job):
+            self.pattern_job.publish_plans(compile_tracks(self.patterns))
+
+    def get_seed(self):
+        text = self.seed_input.text().strip()
+        if not text:
+            return None
+        try:
+            return int(text)
+        except ValueError:
+            print(f"Ignoring invalid seed: {text}")
+            return None
+
+    def stop_pattern(self):
+        # Returns at once; the scheduler releases the keys the pattern holds
+        # and on_job_finished() re-enables Start
+        self.is_pattern_active = False
+        if self.is_job_running(self.pattern_job):
+            self.stop_button.setEnabled(False)
+            self.pattern_job.stop()
+        else:
+            self.on_pattern_complete()
+
+    def on_job_finished(self, job, completed):
+        for key, saved_job in list(self.saved_jobs.items()):
+            if saved_job is job:
+                del self.saved_jobs[key]
+        if job is self.pattern_job:
+            self.on_pattern_complete()
+        elif job is self.constant_key_job:
+            self.on_constant_key_released()
+
+    def on_pattern_complete(self):
+        self.start_button.setEnabled(True)
+        self.stop_button.setEnabled(False)
+        self.is_pattern_active = False
+
+def wake_on_signals(app):
+    """Run Python signal handlers while Qt's event loop is waiting.
+
+    Python only runs a signal handler once the main thread executes Python
+    code again, which an idle app.exec() never does. The signal's wakeup
+    byte is written to a socket that Qt watches, and reading it is enough
+    to get the handler run.
+    """
+    reader, writer = socket.socketpair()
+    reader.setblocking(False)
+    writer.setblocking(False)
+    try:
+        signal.set_wakeup_fd(writer.fileno())
+    except ValueError as e:
+        print(f"Signals will wait for the next event: {e}")
+        return
+
+    def drain():
+        try:
+            reader.recv(64)
+        except OSError:
+            pass
+
+    notifier = QSocketNotifier(reader.fileno(), QSocketNotifier.Type.Read, app)
+    notifier.activated.connect(drain)
+    app._signal_wakeup = (reader, writer, notifier)  # Kept alive with the app
+
+
+def main(argv=None, profile=None):
+    """Start the GUI. profile, if given, gets a mark() call after each startup stage."""
+    app = QApplication(sys.argv if argv is None else argv)
+    wake_on_signals(app)
+    if profile:
+        profile.mark("Create QApplication")
+    window = AutoKeyHolder()
+    if profile:
+        profile.mark("Build main window")
+    window.show()
+    if profile:
+        profile.mark("Show window")
+        # The first event loop turn is when the window actually reaches the screen
+        QTimer.singleShot(0, profile.finish)
+    return app.exec()
+
+if __name__ == '__main__':
+    sys.exit(main())
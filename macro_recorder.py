@@ -0,0 +1,232 @@
+"""Recording live key events and turning them into patterns.
+
+MacroRecorder hooks every key down and up event of an input backend and
+writes a timestamp and a key code into preallocated arrays used as a ring
+buffer, so the hook callback does a clock read, a dict lookup and two array
+stores, whatever the typing speed. Nothing is converted until the recording
+is stopped; if more events arrive than the buffer holds, the oldest ones are
+dropped and counted.
+
+events_to_patterns() turns the captured events into (key, hold, wait[, track])
+pattern tuples. Each press/release pair becomes a step; keys held at the
+same time (Shift under a run of taps, for example) are spread over tracks,
+and a track whose first key comes later than the recording's start begins
+with a rest step. Every track lasts as long as the whole recording, so
+repetitions stay in step with each other.
+"""
+import json
+import os
+import time
+from array import array
+
+from input_backends import KEY_DOWN, KEY_UP
+from pattern_io import REST_KEY, format_duration, with_track
+
+DEFAULT_CAPACITY = 1 << 16  # Events kept; about 12 bytes each
+
+
+def _seconds(duration_ns):
+    return format_duration(round(duration_ns / 1e9, 6))  # Whole microseconds
+
+
+class MacroRecorder:
+    """Captures key events from a backend into a fixed-size ring buffer"""
+
+    def __init__(self, backend, capacity=DEFAULT_CAPACITY):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.backend = backend
+        self.capacity = capacity
+        self._times = array('q', bytes(8 * capacity))
+        self._codes = array('i', bytes(4 * capacity))  # key number * 2 + 1 for a key down
+        self._clock = time.perf_counter_ns
+        self._key_numbers = {}
+        self.keys = []
+        self._count = 0  # Events seen since start(), including dropped ones
+        self._handle = None
+        self.started_ns = None
+        self.stopped_ns = None
+
+    @property
+    def recording(self):
+        return self._handle is not None
+
+    @property
+    def dropped(self):
+        """Events lost because the buffer was full"""
+        return max(0, self._count - self.capacity)
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    def start(self):
+        """Clear the buffer and start capturing"""
+        if self._handle is not None:
+            return self
+        self._key_numbers.clear()
+        del self.keys[:]
+        self._count = 0
+        self.stopped_ns = None
+        self.started_ns = self._clock()
+        self._handle = self.backend.hook(self._record)
+        return self
+
+    def stop(self):
+        """Stop capturing. Returns the recorded events."""
+        if self._handle is not None:
+            self.backend.unhook(self._handle)
+            self._handle = None
+            self.stopped_ns = self._clock()
+        return self.events()
+
+    def _record(self, event):
+        # Runs on the backend's hook thread for every key event
+        now = self._clock()
+        name = event.name
+        if name is None:
+            return
+        number = self._key_numbers.get(name)
+        if number is None:
+            number = self._key_numbers[name] = len(self.keys)
+            self.keys.append(name)
+        position = self._count % self.capacity
+        self._times[position] = now
+        self._codes[position] = number * 2 + (event.event_type == KEY_DOWN)
+        self._count += 1
+
+    def events(self):
+        """Recorded (perf_counter_ns, event_type, key) tuples, oldest first.
+
+        The same shape as RecordingBackend.events, so a capture and its replay
+        can be compared directly.
+        """
+        count = len(self)
+        first = (self._count - count) % self.capacity
+        order = list(range(first, count)) + list(range(first)) if first else range(count)
+        keys = self.keys
+        times = self._times
+        codes = self._codes
+        return [(times[i], KEY_DOWN if codes[i] & 1 else KEY_UP, keys[codes[i] >> 1])
+                for i in order]
+
+    def to_patterns(self, quantize=0.0, merge_gap=0.0):
+        """Patterns for what was recorded; see events_to_patterns()"""
+        return events_to_patterns(self.events(), quantize, merge_gap, self.stopped_ns)
+
+
+def save_capture(path, events):
+    """Write recorded events as JSON, to replay later (see benchmark.py --capture)"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({"events": [list(event) for event in events]}, f)
+
+
+def load_capture(path):
+    """Read events written by save_capture() as (time_ns, event_type, key) tuples"""
+    with open(path, 'r') as f:
+        config = json.load(f)
+    if not isinstance(config, dict):
+        raise ValueError("Invalid capture format")
+    events = []
+    for number, event in enumerate(config.get("events", []), 1):
+        try:
+            time_ns, event_type, key = event
+            if event_type not in (KEY_DOWN, KEY_UP) or not isinstance(key, str):
+                raise ValueError(f"bad event {event!r}")
+            events.append((int(time_ns), event_type, key))
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Invalid event {number}: {e}") from None
+    return events
+
+
+def recorded_notes(events, end_ns=None):
+    """Pair key downs with their key ups into (start_ns, end_ns, key) notes.
+
+    Auto-repeated key downs of a key that is already held are ignored, as are
+    key ups with no key down (their press was before the recording or was
+    dropped). Keys still held at the end are released at end_ns, or at the
+    last event.
+    """
+    held = {}
+    notes = []
+    for time_ns, event_type, key in events:
+        if event_type == KEY_DOWN:
+            if key not in held:
+                held[key] = time_ns
+        else:
+            start_ns = held.pop(key, None)
+            if start_ns is not None:
+                notes.append((start_ns, time_ns, key))
+    if held:
+        last_ns = events[-1][0]
+        if end_ns is None or end_ns < last_ns:
+            end_ns = last_ns
+        notes.extend((start_ns, end_ns, key) for key, start_ns in held.items())
+    notes.sort()
+    return notes
+
+
+def _merge_notes(notes, merge_gap_ns):
+    # Join presses of the same key separated by less than the gap (key bounce)
+    merged = []
+    last_of_key = {}
+    for start_ns, end_ns, key in notes:
+        index = last_of_key.get(key)
+        if index is not None and start_ns - merged[index][1] < merge_gap_ns:
+            previous_start, previous_end, _ = merged[index]
+            merged[index] = (previous_start, max(previous_end, end_ns), key)
+            continue
+        last_of_key[key] = len(merged)
+        merged.append((start_ns, end_ns, key))
+    return merged
+
+
+def events_to_patterns(events, quantize=0.0, merge_gap=0.0, end_ns=None):
+    """Convert recorded (time_ns, event_type, key) events into pattern tuples.
+
+    quantize snaps every press and release to a grid of that many seconds
+    (0 keeps the recorded timing). Presses of the same key less than
+    merge_gap seconds apart are joined into one. Overlapping keys go to
+    tracks 2, 3, ... in the order they are needed. Time before the first
+    press is dropped.
+    """
+    notes = recorded_notes(events, end_ns)
+    if not notes:
+        return []
+    if merge_gap > 0:
+        notes = _merge_notes(notes, round(merge_gap * 1_000_000_000))
+
+    origin_ns = notes[0][0]
+    grid_ns = round(quantize * 1_000_000_000)
+    if grid_ns > 0:
+        def snap(time_ns):
+            return round((time_ns - origin_ns) / grid_ns) * grid_ns
+    else:
+        def snap(time_ns):
+            return time_ns - origin_ns
+    notes = sorted((snap(start_ns), snap(end_ns), key) for start_ns, end_ns, key in notes)
+
+    # Interval partitioning: each note goes to the first track free at its start
+    tracks = []
+    free_at = []
+    for note in notes:
+        for number, free_ns in enumerate(free_at):
+            if free_ns <= note[0]:
+                break
+        else:
+            number = len(tracks)
+            tracks.append([])
+            free_at.append(0)
+        tracks[number].append(note)
+        free_at[number] = note[1]
+
+    total_ns = max(free_at)
+    patterns = []
+    for number, track_notes in enumerate(tracks, 1):
+        if track_notes[0][0] > 0:
+            patterns.append(with_track(REST_KEY, _seconds(track_notes[0][0]), "0.0", number))
+        for i, (press_ns, release_ns, key) in enumerate(track_notes):
+            next_ns = track_notes[i + 1][0] if i + 1 < len(track_notes) else total_ns
+            patterns.append(with_track(key, _seconds(release_ns - press_ns),
+                                       _seconds(next_ns - release_ns), number))
+    return patterns
@@ -0,0 +1,276 @@
+"""Compact binary pattern files (.akhp).
+
+Large recorded macros are slow to parse as pretty-printed JSON, so patterns
+can also be stored as:
+
+    header     "<4sHHIIII"  magic b"AKHP", version, flags, key count,
+                            step count, key table bytes, hotkey bytes
+    key table  per key: "<H" byte length + UTF-8 name
+    hotkey     UTF-8, present if FLAG_HOTKEY is set
+    padding    to a multiple of 4 bytes
+    steps      "<IIdddd" per step: key index, track | range flags,
+               hold min, hold max, wait min, wait max (seconds, float64)
+
+BinaryPatternFile maps a file with mmap and decodes steps on demand, so
+opening even a huge file reads only the header and key table. Converting
+back to the JSON layout writes the shortest fixed-point decimal that reads
+back as the same float64, so a JSON -> binary -> JSON round trip gives back
+the same strings for any duration written as a plain decimal of up to 15
+significant digits (the recorder writes microseconds, "123.456789").
+
+Version 1 files stored float32 durations ("<IIffff"); they are still read,
+with each duration written back as the shortest decimal for its float32.
+"""
+import math
+import mmap
+import os
+import struct
+from array import array
+from functools import lru_cache
+
+from key_engine import PatternPlan
+from pattern_io import format_duration, parse_duration, pattern_track, with_track
+
+BINARY_EXTENSION = ".akhp"
+MAGIC = b"AKHP"
+VERSION = 2
+
+FLAG_HOTKEY = 0x1
+
+# Set in a step's track field when the hold / wait was written as a min-max range
+HOLD_RANGE = 0x10000
+WAIT_RANGE = 0x20000
+TRACK_MASK = 0xFFFF
+
+_HEADER = struct.Struct("<4sHHIIII")
+_KEY_LENGTH = struct.Struct("<H")
+_STEP = struct.Struct("<IIdddd")
+_STEP_FLOAT32 = struct.Struct("<IIffff")  # Version 1
+_STEP_FORMATS = {1: _STEP_FLOAT32, VERSION: _STEP}
+_FLOAT32 = struct.Struct("<f")
+
+
+def is_binary_path(path):
+    return str(path).lower().endswith(BINARY_EXTENSION)
+
+
+def _to_float32(value):
+    return _FLOAT32.unpack(_FLOAT32.pack(value))[0]
+
+
+@lru_cache(maxsize=4096)  # Recorded macros reuse a handful of durations
+def format_float32(value):
+    """Shortest fixed-point decimal that reads back as the same float32"""
+    if not math.isfinite(value):
+        return repr(value)
+    for digits in range(1, 10):
+        text = f"{value:.{digits}g}"
+        if _to_float32(float(text)) == value:
+            break
+    return format_duration(text)
+
+
+@lru_cache(maxsize=4096)
+def format_float64(value):
+    """Shortest fixed-point decimal that reads back as the same float"""
+    if not math.isfinite(value):
+        return repr(value)
+    return format_duration(value)
+
+
+def _duration_text(low, high, is_range, format_value=format_float64):
+    if is_range:
+        return f"{format_value(low)}-{format_value(high)}"
+    return format_value(low)
+
+
+def _is_range(value):
+    return isinstance(value, str) and "-" in value
+
+
+def pack_patterns(patterns, pattern_hotkey=None):
+    """Encode (key, hold, wait[, track]) patterns as the bytes of a binary file"""
+    keys = []
+    key_table = {}
+    steps = bytearray()
+    for number, pattern in enumerate(patterns, 1):
+        try:
+            key = pattern[0]
+            hold = parse_duration(pattern[1])
+            wait = parse_duration(pattern[2])
+            track = pattern_track(pattern)
+            if not 1 <= track <= TRACK_MASK:
+                raise ValueError(f"invalid track {track}")
+        except (ValueError, IndexError, TypeError) as e:
+            raise ValueError(f"Invalid step {number}: {e}") from None
+        index = key_table.get(key)
+        if index is None:
+            index = key_table[key] = len(keys)
+            keys.append(key)
+        flags = track
+        if _is_range(pattern[1]):
+            flags |= HOLD_RANGE
+        if _is_range(pattern[2]):
+            flags |= WAIT_RANGE
+        steps += _STEP.pack(index, flags, hold[0], hold[1], wait[0], wait[1])
+
+    table = bytearray()
+    for key in keys:
+        encoded = key.encode("utf-8")
+        table += _KEY_LENGTH.pack(len(encoded)) + encoded
+    hotkey = pattern_hotkey.encode("utf-8") if pattern_hotkey is not None else b""
+    flags = FLAG_HOTKEY if pattern_hotkey is not None else 0
+
+    header = _HEADER.pack(MAGIC, VERSION, flags, len(keys), len(patterns), len(table), len(hotkey))
+    body = header + table + hotkey
+    padding = b"\0" * (-len(body) % 4)
+    return body + padding + steps
+
+
+def save_binary_file(path, patterns, pattern_hotkey=None):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    data = pack_patterns(patterns, pattern_hotkey)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+class BinaryPatternFile:
+    """Read-only, memory-mapped view of a binary pattern file.
+
+    Only the header and key table are decoded when the file is opened;
+    steps are unpacked as they are read.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < _HEADER.size:
+                raise ValueError(f"Not a binary pattern file: {path}")
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._parse_header(size)
+        except Exception:
+            self.close()
+            raise
+
+    def _parse_header(self, size):
+        buffer = self._map
+        magic, version, flags, key_count, step_count, table_size, hotkey_size = \
+            _HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Not a binary pattern file: {self.path}")
+        self._step = _STEP_FORMATS.get(version)
+        if self._step is None:
+            raise ValueError(f"Unsupported binary pattern version {version}")
+        self._format_value = format_float32 if self._step is _STEP_FLOAT32 else format_float64
+
+        offset = _HEADER.size
+        keys = []
+        table_end = offset + table_size
+        for _ in range(key_count):
+            (length,) = _KEY_LENGTH.unpack_from(buffer, offset)
+            offset += _KEY_LENGTH.size
+            keys.append(bytes(buffer[offset:offset + length]).decode("utf-8"))
+            offset += length
+        if offset != table_end:
+            raise ValueError("Corrupt key table")
+        self.keys = tuple(keys)
+        self.pattern_hotkey = (bytes(buffer[offset:offset + hotkey_size]).decode("utf-8")
+                               if flags & FLAG_HOTKEY else None)
+        offset += hotkey_size
+        self._steps_offset = offset + (-offset % 4)
+        self._step_count = step_count
+        if self._steps_offset + step_count * self._step.size > size:
+            raise ValueError("Binary pattern file is truncated")
+
+    def __len__(self):
+        return self._step_count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                pass  # A step iterator is still alive; the map is freed with it
+            self._map = None
+
+    def record(self, i):
+        """(key index, track | flags, hold min, hold max, wait min, wait max) of step i"""
+        if not 0 <= i < self._step_count:
+            raise IndexError(i)
+        return self._step.unpack_from(self._map, self._steps_offset + i * self._step.size)
+
+    def records(self, start=0, stop=None):
+        """Iterate over raw step records without copying the file"""
+        stop = self._step_count if stop is None else min(stop, self._step_count)
+        step = self._step
+        begin = self._steps_offset + start * step.size
+        end = self._steps_offset + stop * step.size
+        yield from step.iter_unpack(memoryview(self._map)[begin:end])
+
+    def steps(self, start=0, stop=None):
+        """Iterate over (key, hold, wait[, track]) pattern tuples as saved in JSON"""
+        keys = self.keys
+        format_value = self._format_value
+        for index, flags, hold_low, hold_high, wait_low, wait_high in self.records(start, stop):
+            yield with_track(keys[index],
+                             _duration_text(hold_low, hold_high, flags & HOLD_RANGE, format_value),
+                             _duration_text(wait_low, wait_high, flags & WAIT_RANGE, format_value),
+                             flags & TRACK_MASK)
+
+    def patterns(self):
+        return list(self.steps())
+
+    def track_numbers(self):
+        """Sorted track numbers used by the steps (one pass over the records)"""
+        return sorted({flags & TRACK_MASK for _, flags, *_ in self.records()})
+
+    def track_steps(self, track):
+        """Iterate over (key, (hold min, max), (wait min, max)) steps of one track.
+
+        Feeds a StepStream without building the whole plan in memory.
+        """
+        keys = self.keys
+        for index, flags, hold_low, hold_high, wait_low, wait_high in self.records():
+            if flags & TRACK_MASK == track:
+                yield keys[index], (hold_low, hold_high), (wait_low, wait_high)
+
+    def plans(self):
+        """Compile the steps straight into {track number: PatternPlan}, skipping text"""
+        columns = {}
+        for index, flags, hold_low, hold_high, wait_low, wait_high in self.records():
+            track = flags & TRACK_MASK
+            column = columns.get(track)
+            if column is None:
+                column = columns[track] = ({}, array('I'), array('d'), array('d'),
+                                           array('d'), array('d'))
+            track_keys, key_index, hold_min, hold_max, wait_min, wait_max = column
+            # Re-index keys per track so each plan's key table holds only its own keys
+            local = track_keys.get(index)
+            if local is None:
+                local = track_keys[index] = len(track_keys)
+            key_index.append(local)
+            hold_min.append(hold_low)
+            hold_max.append(hold_high)
+            wait_min.append(wait_low)
+            wait_max.append(wait_high)
+
+        keys = self.keys
+        plans = {}
+        for track in sorted(columns):
+            track_keys, *arrays = columns[track]
+            plans[track] = PatternPlan(tuple(keys[index] for index in track_keys), *arrays)
+        return plans
+
+
+def load_binary_file(path):
+    """Load a binary pattern file. Returns (patterns, pattern_hotkey)."""
+    with BinaryPatternFile(path) as pattern_file:
+        return pattern_file.patterns(), pattern_file.pattern_hotkey
@@ -0,0 +1,149 @@
+"""Reading and writing saved configurations without touching Qt.
+
+Pattern saves are JSON files of the form written by the GUI's save_pattern:
+
+    {"patterns": [{"key": "w", "mode": "Custom", "hold": "1.0", "wait": "0.5"},
+                  {"key": "a", "mode": "Random", "hold_range": "0.5-2.0",
+                   "wait_range": "0.0-1.0"},
+                  {"key": "shift", "mode": "Custom", "hold": "3.0", "wait": "0.0",
+                   "track": 2}],
+     "pattern_hotkey": "f6"}
+
+Steps without a "track" play on track 1; steps on different tracks run at
+the same time. A step with an empty key is a rest: it presses nothing for
+its hold and wait (recorded macros use one to start a track late).
+"""
+import json
+import os
+from decimal import Decimal
+
+SAVES_DIR = "saves"
+CONSTANT_DIR = os.path.join(SAVES_DIR, "constant")
+PATTERN_DIR = os.path.join(SAVES_DIR, "patterns")
+
+REST_KEY = ""
+
+
+def parse_duration(value):
+    """Parse a stored duration ('0.5-2.0', '1.0' or a number) into (min, max) seconds"""
+    if isinstance(value, str):
+        text = value.strip()
+        if '-' in text:
+            low, high = map(float, text.split('-'))
+        else:
+            low = high = float(text)
+    else:
+        low = high = float(value)
+    if low < 0 or high < low:
+        raise ValueError(f"Invalid duration range: {value!r}")
+    return low, high
+
+
+def format_duration(value):
+    """Write seconds so parse_duration() reads them back as the same number.
+
+    value is a float (written as its shortest repr) or the digits of one.
+    Exponents are spelled out, '5e-05' -> '0.00005', since parse_duration()
+    would read the '-' as a min-max separator.
+    """
+    text = value if isinstance(value, str) else repr(float(value))
+    if "e" in text:
+        text = format(Decimal(text), "f")
+    return text if "." in text else text + ".0"
+
+
+def is_random_pattern(pattern):
+    return isinstance(pattern[1], str) and "-" in pattern[1]
+
+
+def pattern_track(pattern):
+    """Track number of a pattern tuple; (key, hold, wait) steps play on track 1"""
+    return int(pattern[3]) if len(pattern) > 3 else 1
+
+
+def with_track(key, hold, wait, track=1):
+    """Build a pattern tuple, leaving out the track when it is the default"""
+    return (key, hold, wait) if track == 1 else (key, hold, wait, track)
+
+
+def patterns_to_config(patterns, pattern_hotkey=None):
+    """Build the JSON document saved for a list of (key, hold, wait[, track]) patterns"""
+    patterns_config = []
+    for pattern in patterns:
+        if is_random_pattern(pattern):
+            step = {
+                "key": pattern[0],
+                "mode": "Random",
+                "hold_range": pattern[1],
+                "wait_range": pattern[2]
+            }
+        else:
+            step = {
+                "key": pattern[0],
+                "mode": "Custom",
+                "hold": pattern[1],
+                "wait": pattern[2]
+            }
+        track = pattern_track(pattern)
+        if track != 1:
+            step["track"] = track
+        patterns_config.append(step)
+    return {
+        "patterns": patterns_config,
+        "pattern_hotkey": pattern_hotkey
+    }
+
+
+def config_to_patterns(config):
+    """Turn a saved pattern document back into (key, hold, wait[, track]) tuples.
+
+    Every step is validated in the same pass; the first invalid one raises
+    ValueError naming its step number.
+    """
+    patterns = []
+    append = patterns.append
+    for number, pattern in enumerate(config.get("patterns", []), 1):
+        try:
+            key = pattern["key"]
+            if not isinstance(key, str) or (key != REST_KEY and not key.strip()):
+                raise ValueError("missing key")
+            track = int(pattern.get("track", 1))
+            if track < 1:
+                raise ValueError(f"invalid track {track}")
+            if pattern["mode"] == "Random":
+                hold, wait = pattern["hold_range"], pattern["wait_range"]
+            else:
+                hold, wait = str(pattern["hold"]), str(pattern["wait"])
+            parse_duration(hold)
+            parse_duration(wait)
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            raise ValueError(f"Invalid step {number}: {e}") from None
+        append(with_track(key, hold, wait, track))
+    return patterns
+
+
+def load_pattern_file(path):
+    """Load a saved pattern file (JSON, or binary .akhp). Returns (patterns, pattern_hotkey)."""
+    if path.lower().endswith(".akhp"):
+        from pattern_binary import load_binary_file
+        return load_binary_file(path)
+    with open(path, 'r') as f:
+        config = json.load(f)
+    if not isinstance(config, dict):
+        raise ValueError("Invalid pattern configuration format")
+    return config_to_patterns(config), config.get("pattern_hotkey")
+
+
+def save_pattern_file(path, patterns, pattern_hotkey=None):
+    if path.lower().endswith(".akhp"):
+        from pattern_binary import save_binary_file
+        return save_binary_file(path, patterns, pattern_hotkey)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(patterns_to_config(patterns, pattern_hotkey), f, indent=4)
+
+
+def save_constant_file(path, key, hotkey=None):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({"key": key, "hotkey": hotkey}, f, indent=4)
@@ -0,0 +1,318 @@
+"""Table model and editors for the pattern list.
+
+The pattern list is shown in a QTableView backed by PatternTableModel, so
+only the rows on screen are painted and an editor widget exists only for the
+cell being edited. Inserting, removing and renumbering rows are plain model
+operations instead of building and relabelling a frame of widgets per step.
+"""
+from itertools import count
+
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PyQt6.QtWidgets import (QComboBox, QDoubleSpinBox, QHBoxLayout, QLabel,
+                             QSpinBox, QStyledItemDelegate, QWidget)
+
+from pattern_io import REST_KEY, is_random_pattern, parse_duration, pattern_track, with_track
+
+KEY_COLUMN, MODE_COLUMN, HOLD_COLUMN, WAIT_COLUMN, TRACK_COLUMN = range(5)
+MODES = ("Custom", "Random")
+MAX_TRACKS = 16
+LISTEN_PROMPT = "Press key combination..."
+REST_LABEL = "(rest)"
+RANGE_TOOLTIP = "If min and max are equal, this time will be used exactly (no randomization)"
+
+
+def format_seconds(value):
+    """1.0 -> '1.0', 0.125 -> '0.125'"""
+    return f"{value:.1f}" if round(value, 1) == value else f"{value:g}"
+
+
+class PatternTableModel(QAbstractTableModel):
+    """Exposes a list of (key, hold, wait[, track]) pattern tuples as an editable table.
+
+    The model edits the list it is given in place, so the owner's reference
+    to it always reflects the table. Every row also gets a stable pattern id;
+    id -> row lookups are a dict read, and removing rows only renumbers the
+    rows after them.
+    """
+    HEADERS = ("Key", "Mode", "Hold", "Wait", "Track")
+
+    def __init__(self, patterns, parent=None):
+        super().__init__(parent)
+        self.patterns = patterns
+        self._new_id = count(1).__next__
+        self._ids = [self._new_id() for _ in patterns]  # Stable id of each row
+        self._row_of = {pattern_id: row for row, pattern_id in enumerate(self._ids)}
+        self.prompt_id = None  # Pattern whose key is being captured
+
+    # Read access
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.patterns)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        # Row numbers come from the header, so renumbering costs nothing
+        return f"#{section + 1}"
+
+    def pattern_id(self, row):
+        return self._ids[row]
+
+    def row_of(self, pattern_id):
+        """Current row of a pattern id, or None if it was removed"""
+        return self._row_of.get(pattern_id)
+
+    def is_random(self, row):
+        return is_random_pattern(self.patterns[row])
+
+    def durations(self, row, column):
+        """(min, max) of the hold or wait column of a row"""
+        try:
+            return parse_duration(self.patterns[row][column - 1])
+        except (ValueError, TypeError):
+            return 0.0, 0.0
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row, column = index.row(), index.column()
+        pattern = self.patterns[row]
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == KEY_COLUMN:
+                if self._ids[row] == self.prompt_id:
+                    return LISTEN_PROMPT
+                return REST_LABEL if pattern[0] == REST_KEY else pattern[0]
+            if column == MODE_COLUMN:
+                return "Random" if self.is_random(row) else "Custom"
+            if column == TRACK_COLUMN:
+                return pattern_track(pattern)
+            low, high = self.durations(row, column)
+            if self.is_random(row):
+                return f"{format_seconds(low)} - {format_seconds(high)} s"
+            return f"{format_seconds(low)} s"
+        if role == Qt.ItemDataRole.EditRole:
+            if column == KEY_COLUMN:
+                return pattern[0]
+            if column == MODE_COLUMN:
+                return "Random" if self.is_random(row) else "Custom"
+            if column == TRACK_COLUMN:
+                return pattern_track(pattern)
+            return self.durations(row, column)
+        if role == Qt.ItemDataRole.TextAlignmentRole:
+            return Qt.AlignmentFlag.AlignCenter
+        if role == Qt.ItemDataRole.ToolTipRole and column in (HOLD_COLUMN, WAIT_COLUMN):
+            return RANGE_TOOLTIP if self.is_random(row) else None
+        return None
+
+    def flags(self, index):
+        flags = super().flags(index)
+        # Keys are captured with Listen rather than typed
+        if index.isValid() and index.column() != KEY_COLUMN:
+            flags |= Qt.ItemFlag.ItemIsEditable
+        return flags
+
+    # Editing
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        if not index.isValid() or role != Qt.ItemDataRole.EditRole:
+            return False
+        row, column = index.row(), index.column()
+        key, hold, wait = self.patterns[row][:3]
+        track = pattern_track(self.patterns[row])
+        random = self.is_random(row)
+
+        if column == TRACK_COLUMN:
+            track = int(value)
+            if not 1 <= track <= MAX_TRACKS:
+                return False
+        elif column == KEY_COLUMN:
+            key = str(value).strip()
+            if not key:
+                return False
+        elif column == MODE_COLUMN:
+            to_random = value == "Random"
+            if to_random == random:
+                return False
+            # Keep the current durations, as an equal range or as the range minimum
+            hold_low, hold_high = self.durations(row, HOLD_COLUMN)
+            wait_low, wait_high = self.durations(row, WAIT_COLUMN)
+            if to_random:
+                hold, wait = f"{hold_low}-{hold_high}", f"{wait_low}-{wait_high}"
+            else:
+                hold, wait = str(hold_low), str(wait_low)
+        else:
+            low, high = value
+            high = max(low, high)
+            text = f"{low}-{high}" if random else str(low)
+            if column == HOLD_COLUMN:
+                hold = text
+            else:
+                wait = text
+
+        self.patterns[row] = with_track(key, hold, wait, track)
+        # A mode change also changes how the duration cells look
+        self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+        return True
+
+    def set_key(self, pattern_id, key):
+        """Set the key of a pattern by id. Does nothing if it was removed."""
+        self.set_prompt(None)
+        row = self.row_of(pattern_id)
+        if row is None:
+            return False
+        return self.setData(self.index(row, KEY_COLUMN), key)
+
+    def set_prompt(self, pattern_id):
+        """Show the listen prompt in a pattern's key cell (None to hide it)"""
+        previous, self.prompt_id = self.prompt_id, pattern_id
+        for changed in (previous, pattern_id):
+            row = self.row_of(changed)
+            if row is not None:
+                index = self.index(row, KEY_COLUMN)
+                self.dataChanged.emit(index, index)
+
+    def append_pattern(self, pattern):
+        """Append a pattern and return its id"""
+        row = len(self.patterns)
+        pattern_id = self._new_id()
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.patterns.append(pattern)
+        self._ids.append(pattern_id)
+        self._row_of[pattern_id] = row
+        self.endInsertRows()
+        return pattern_id
+
+    def remove_rows(self, row, count=1):
+        """Remove count rows starting at row. Returns the removed patterns."""
+        if count <= 0 or row < 0 or row + count > len(self.patterns):
+            return []
+        self.beginRemoveRows(QModelIndex(), row, row + count - 1)
+        removed = self.patterns[row:row + count]
+        del self.patterns[row:row + count]
+        for pattern_id in self._ids[row:row + count]:
+            del self._row_of[pattern_id]
+        del self._ids[row:row + count]
+        # Only the rows after the removed ones move up
+        for moved_row in range(row, len(self._ids)):
+            self._row_of[self._ids[moved_row]] = moved_row
+        self.endRemoveRows()
+        return removed
+
+    def set_patterns(self, patterns):
+        """Replace every row at once; views refresh a single time"""
+        self.beginResetModel()
+        self.patterns[:] = patterns
+        self._ids = [self._new_id() for _ in self.patterns]
+        self._row_of = {pattern_id: row for row, pattern_id in enumerate(self._ids)}
+        self.prompt_id = None
+        self.endResetModel()
+
+    def clear(self):
+        self.set_patterns([])
+
+
+class RowKeyTarget:
+    """Lets key capture write into a table row the way it writes into a QLineEdit.
+
+    The row is remembered by pattern id, so capture still lands on the right
+    pattern if rows above it are removed while listening.
+    """
+
+    def __init__(self, model, row):
+        self.model = model
+        self.pattern_id = model.pattern_id(row)
+
+    def setText(self, text):
+        if text == LISTEN_PROMPT:
+            self.model.set_prompt(self.pattern_id)
+        else:
+            self.model.set_key(self.pattern_id, text)
+
+    def clear(self):
+        self.model.set_prompt(None)
+
+    def setAlignment(self, alignment):
+        pass  # Cells are always centered
+
+
+class ModeDelegate(QStyledItemDelegate):
+    """Custom/Random combo box for the Mode column"""
+
+    def createEditor(self, parent, option, index):
+        combo = QComboBox(parent)
+        combo.addItems(MODES)
+        # Apply as soon as a mode is picked instead of waiting for focus to leave
+        combo.activated.connect(lambda: self.commitData.emit(combo))
+        return combo
+
+    def setEditorData(self, editor, index):
+        editor.setCurrentText(index.data(Qt.ItemDataRole.EditRole))
+
+    def setModelData(self, editor, model, index):
+        model.setData(index, editor.currentText(), Qt.ItemDataRole.EditRole)
+
+
+class TrackDelegate(QStyledItemDelegate):
+    """Spin box for the Track column"""
+
+    def createEditor(self, parent, option, index):
+        spin = QSpinBox(parent)
+        spin.setRange(1, MAX_TRACKS)
+        return spin
+
+    def setEditorData(self, editor, index):
+        editor.setValue(index.data(Qt.ItemDataRole.EditRole))
+
+    def setModelData(self, editor, model, index):
+        model.setData(index, editor.value(), Qt.ItemDataRole.EditRole)
+
+
+class DurationDelegate(QStyledItemDelegate):
+    """Editor for hold/wait cells: one spin box for Custom rows, min-max for Random rows"""
+
+    def __init__(self, minimum, parent=None):
+        super().__init__(parent)
+        self.minimum = minimum
+
+    def _spin(self, parent):
+        spin = QDoubleSpinBox(parent)
+        spin.setRange(self.minimum, 9999.0)
+        spin.setSingleStep(0.1)
+        spin.setDecimals(1)
+        spin.setSuffix(" s")
+        return spin
+
+    def createEditor(self, parent, option, index):
+        editor = QWidget(parent)
+        editor.setAutoFillBackground(True)
+        layout = QHBoxLayout(editor)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(2)
+        editor.spins = [self._spin(editor)]
+        layout.addWidget(editor.spins[0])
+        if index.model().is_random(index.row()):
+            editor.spins.append(self._spin(editor))
+            layout.addWidget(QLabel("-"))
+            layout.addWidget(editor.spins[1])
+            editor.setToolTip(RANGE_TOOLTIP)
+        return editor
+
+    def setEditorData(self, editor, index):
+        low, high = index.data(Qt.ItemDataRole.EditRole)
+        editor.spins[0].setValue(low)
+        if len(editor.spins) > 1:
+            editor.spins[1].setValue(high)
+
+    def setModelData(self, editor, model, index):
+        low = editor.spins[0].value()
+        high = editor.spins[-1].value()
+        model.setData(index, (low, high), Qt.ItemDataRole.EditRole)
+
+    def updateEditorGeometry(self, editor, option, index):
+        editor.setGeometry(option.rect)
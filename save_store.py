@@ -0,0 +1,185 @@
+"""Index of saved configurations for the Load dialog.
+
+Listing saves used to mean reading the save directories and every file in
+them. SaveStore keeps a small index (saves/index.json) with the metadata the
+dialog shows, and refresh() only re-reads files whose mtime or size changed
+since the index was written, so opening the dialog costs one directory scan.
+"""
+import json
+import os
+
+from key_engine import compile_tracks
+from pattern_io import (CONSTANT_DIR, PATTERN_DIR, SAVES_DIR, config_to_patterns,
+                        save_constant_file, save_pattern_file)
+
+CONSTANT = "constant"
+PATTERN = "pattern"
+CONFIG_TYPES = (CONSTANT, PATTERN)
+
+INDEX_VERSION = 1
+
+
+class SaveEntry:
+    """Metadata of one saved configuration"""
+    __slots__ = ('config_type', 'name', 'mtime_ns', 'size', 'key', 'hotkey',
+                 'steps', 'tracks', 'duration', 'error')
+    FIELDS = __slots__
+
+    def __init__(self, config_type, name, mtime_ns=0, size=0, key=None, hotkey=None,
+                 steps=0, tracks=0, duration=(0.0, 0.0), error=None):
+        self.config_type = config_type
+        self.name = name
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.key = key            # Constant key saves only
+        self.hotkey = hotkey
+        self.steps = steps        # Pattern saves only
+        self.tracks = tracks
+        self.duration = tuple(duration)  # (min, max) seconds of one repetition
+        self.error = error        # Set if the file could not be read
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{field: data[field] for field in cls.FIELDS if field in data})
+
+    def __repr__(self):
+        return f"SaveEntry({self.config_type!r}, {self.name!r})"
+
+
+def read_entry(config_type, name, path, stat):
+    """Build the SaveEntry of a save file"""
+    entry = SaveEntry(config_type, name, stat.st_mtime_ns, stat.st_size)
+    try:
+        with open(path, 'r') as f:
+            config = json.load(f)
+        if not isinstance(config, dict):
+            raise ValueError("Invalid configuration format")
+        if config_type == CONSTANT:
+            entry.key = config.get("key")
+            entry.hotkey = config.get("hotkey")
+        else:
+            entry.hotkey = config.get("pattern_hotkey")
+            plans = compile_tracks(config_to_patterns(config))
+            entry.steps = sum(len(plan) for plan in plans.values())
+            entry.tracks = len(plans)
+            # Tracks run side by side, so a repetition lasts as long as the longest
+            entry.duration = (
+                max((plan.min_cycle_seconds for plan in plans.values()), default=0.0),
+                max((sum(plan.hold_max) + sum(plan.wait_max) for plan in plans.values()),
+                    default=0.0))
+    except Exception as e:
+        entry.error = str(e)
+    return entry
+
+
+class SaveStore:
+    """Saved constant key and pattern configurations, with a cached index"""
+
+    def __init__(self, root=SAVES_DIR):
+        self.root = root
+        if root == SAVES_DIR:
+            self.directories = {CONSTANT: CONSTANT_DIR, PATTERN: PATTERN_DIR}
+        else:
+            self.directories = {CONSTANT: os.path.join(root, "constant"),
+                                PATTERN: os.path.join(root, "patterns")}
+        self.index_path = os.path.join(root, "index.json")
+        self._entries = {}  # (config_type, name) -> SaveEntry
+        self._load_index()
+
+    def path(self, config_type, name):
+        return os.path.join(self.directories[config_type], f"{name}.json")
+
+    def exists(self, config_type, name):
+        return os.path.exists(self.path(config_type, name))
+
+    def entries(self, config_type=None):
+        """Indexed saves, optionally of one type. Call refresh() first to pick up changes."""
+        return [entry for entry in self._entries.values()
+                if config_type is None or entry.config_type == config_type]
+
+    def get(self, config_type, name):
+        return self._entries.get((config_type, name))
+
+    def refresh(self):
+        """Bring the index up to date with the save directories.
+
+        Only files that are new or whose mtime or size changed are read.
+        Returns True if anything changed.
+        """
+        changed = False
+        seen = set()
+        for config_type, directory in self.directories.items():
+            try:
+                listing = os.scandir(directory)
+            except FileNotFoundError:
+                continue
+            with listing:
+                for dir_entry in listing:
+                    if not dir_entry.name.endswith(".json") or not dir_entry.is_file():
+                        continue
+                    index_key = (config_type, dir_entry.name[:-5])
+                    seen.add(index_key)
+                    stat = dir_entry.stat()
+                    entry = self._entries.get(index_key)
+                    if entry is not None and entry.mtime_ns == stat.st_mtime_ns \
+                            and entry.size == stat.st_size:
+                        continue
+                    self._entries[index_key] = read_entry(config_type, index_key[1],
+                                                          dir_entry.path, stat)
+                    changed = True
+
+        for index_key in set(self._entries) - seen:
+            del self._entries[index_key]
+            changed = True
+        if changed:
+            self._write_index()
+        return changed
+
+    def save_constant(self, name, key, hotkey=None):
+        path = self.path(CONSTANT, name)
+        save_constant_file(path, key, hotkey)
+        self._update(CONSTANT, name, path)
+
+    def save_pattern(self, name, patterns, pattern_hotkey=None):
+        path = self.path(PATTERN, name)
+        save_pattern_file(path, patterns, pattern_hotkey)
+        self._update(PATTERN, name, path)
+
+    def delete(self, config_type, name):
+        """Delete a save. Raises FileNotFoundError if it does not exist."""
+        try:
+            os.remove(self.path(config_type, name))
+        finally:
+            if self._entries.pop((config_type, name), None) is not None:
+                self._write_index()
+
+    def _update(self, config_type, name, path):
+        self._entries[(config_type, name)] = read_entry(config_type, name, path, os.stat(path))
+        self._write_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'r') as f:
+                index = json.load(f)
+            if index.get("version") != INDEX_VERSION:
+                return
+            for data in index["entries"]:
+                entry = SaveEntry.from_dict(data)
+                self._entries[(entry.config_type, entry.name)] = entry
+        except (OSError, ValueError, KeyError, TypeError):
+            self._entries.clear()  # Rebuilt by the next refresh()
+
+    def _write_index(self):
+        index = {"version": INDEX_VERSION,
+                 "entries": [entry.to_dict() for entry in self._entries.values()]}
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            temp_path = self.index_path + ".tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(index, f)
+            os.replace(temp_path, self.index_path)
+        except OSError as e:
+            print(f"Could not write save index: {e}")
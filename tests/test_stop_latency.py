@@ -0,0 +1,42 @@
+"""Stopping a job releases exactly the keys it holds, within a bounded time."""
+import time
+
+import benchmark
+from input_backends import KEY_DOWN, KEY_UP, RecordingBackend
+from benchmark import STOP_BUDGET_MS
+from key_engine import EventScheduler, PatternRunner, compile_tracks, TIMING_HIGH_PRECISION
+
+
+def test_stop_releases_held_keys_within_budget_under_load():
+    report = benchmark.stop_latency(stops=20, load_threads=2)
+    assert report["timeouts"] == 0
+    assert report["stuck_keys"] == 0
+    assert report["extra_releases"] == 0
+    assert report["stop_to_release_ms"]["max"] < STOP_BUDGET_MS
+    assert report["within_budget"]
+
+
+def test_stop_releases_only_the_held_keys():
+    backend = RecordingBackend()
+    scheduler = EventScheduler(backend, "test-stop").start()
+    try:
+        # Track 1 holds shift for the whole run, track 2 taps a, b and c
+        patterns = [("shift", "10.0", "0.0"), ("a", "0.5", "0.5", 2), ("b", "0.5", "0.5", 2),
+                    ("c", "0.5", "0.5", 2)]
+        runner = scheduler.submit(PatternRunner(compile_tracks(patterns), backend, 1,
+                                                TIMING_HIGH_PRECISION, seed=1))
+        time.sleep(0.2)  # shift and a are down
+        stop_ns = time.perf_counter_ns()
+        runner.stop()
+        assert time.perf_counter_ns() - stop_ns < STOP_BUDGET_MS * 1e6  # stop() does not block
+        assert runner.wait(1)
+    finally:
+        scheduler.shutdown(1)
+
+    assert runner.completed is False
+    assert runner.stop_latency_ns < STOP_BUDGET_MS * 1e6
+    released = [key for time_ns, event_type, key in backend.events
+                if event_type == KEY_UP and time_ns >= stop_ns]
+    assert sorted(released) == ["a", "shift"]
+    assert not [event for event in backend.events if event[1] == KEY_DOWN and event[2] in "bc"]
+    assert backend.held == set()